@@ -4,9 +4,18 @@ Script de création de l'écosystème MFR Education Automation
 """
 
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Écritures en parallèle : sur un FS réseau (dev containers, Codespaces) chaque appel coûte des dizaines de ms
+MAX_WORKERS = 16
+
+def _write_file(file_path, content):
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write(content)
 
 def create_directory_structure():
-    """Crée l'arborescence des dossiers"""
+    """Crée l'arborescence des dossiers et renvoie les lignes de log"""
     directories = [
         ".github/workflows",
         "google-apps-scripts",
@@ -23,12 +32,12 @@ def create_directory_structure():
         "scripts"
     ]
     
-    for directory in directories:
-        os.makedirs(directory, exist_ok=True)
-        print(f"✅ Dossier créé: {directory}")
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        list(executor.map(lambda directory: os.makedirs(directory, exist_ok=True), directories))
+    return [f"✅ Dossier créé: {directory}" for directory in directories]
 
 def create_github_actions():
-    """Crée les workflows GitHub Actions"""
+    """Crée les workflows GitHub Actions et renvoie les lignes de log"""
     workflows = {
         ".github/workflows/main.yml": """name: MFR Education Automation
 
@@ -54,17 +63,18 @@ jobs:
 """
     }
     
-    for file_path, content in workflows.items():
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-        print(f"✅ Workflow créé: {file_path}")
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        list(executor.map(_write_file, workflows.keys(), workflows.values()))
+    return [f"✅ Workflow créé: {file_path}" for file_path in workflows]
 
 def main():
     """Fonction principale"""
-    print("🚀 Création de l'écosystème MFR Education Automation...")
-    create_directory_structure()
-    create_github_actions()
-    print("🎉 Création terminée avec succès!")
+    # Les logs sont regroupés en une seule écriture plutôt qu'un print (et un flush) par fichier
+    lines = ["🚀 Création de l'écosystème MFR Education Automation..."]
+    lines += create_directory_structure()
+    lines += create_github_actions()
+    lines.append("🎉 Création terminée avec succès!")
+    sys.stdout.write("\n".join(lines) + "\n")
 
 if __name__ == "__main__":
     main()
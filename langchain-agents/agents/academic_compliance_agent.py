@@ -1,133 +1,350 @@
+import asyncio
+import functools
 import os
-import yaml
-from openai import OpenAI
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from tools.batch_runner import BatchQueue  # noqa: E402
+from tools.clients import get_async_openai, get_openai  # noqa: E402
+from tools.completions import DYNAMIC_SEPARATOR, acomplete, complete, parse_json_response, parse_json_result, run_many  # noqa: E402
+from tools.models import MAX_OUTPUT_TOKENS, MAX_TOKENS, MODEL_TIERS, pick_model  # noqa: E402
+from tools.semantic_cache import NAME_PLACEHOLDER, asemantic_complete, semantic_complete  # noqa: E402
+from tools.yaml_cache import load_yaml  # noqa: E402
+
+# Nombre maximal de contenus regroupés dans un même prompt par check_compliance_batch
+COMPLIANCE_BATCH_SIZE = 100
+# Tokens de sortie prévus par contenu dans une vérification groupée
+COMPLIANCE_ITEM_MAX_TOKENS = 150
+
+# Gabarits de prompt : le bloc statique de la compétence vient en tête, les données variables après le séparateur
+COMPLIANCE_TEMPLATE = """{competence_block}
+
+En tant qu'expert en conformité académique, analysez le contenu pédagogique placé après le séparateur et déterminez s'il est conforme aux indicateurs de cette compétence.
+Fournissez une évaluation claire (Conforme, Partiellement Conforme, Non Conforme) et des suggestions spécifiques pour améliorer la conformité si nécessaire.
+Répondez uniquement par un objet JSON de la forme {{"status": "<Conforme|Partiellement Conforme|Non Conforme>", "evaluation": "<justification>", "suggestions": ["<suggestion>", ...]}}.
+
+{separator}
+{content}"""
+
+COMPLIANCE_BATCH_TEMPLATE = """{competence_block}
+
+En tant qu'expert en conformité académique, analysez chacun des contenus pédagogiques placés après le séparateur et déterminez s'il est conforme aux indicateurs de cette compétence.
+Pour chaque ITEM, fournissez une évaluation claire (Conforme, Partiellement Conforme, Non Conforme) et des suggestions spécifiques pour améliorer la conformité si nécessaire.
+Répondez uniquement par un objet JSON de la forme {{"evaluations": [{{"id": <numéro de l'ITEM>, "status": "<évaluation>", "suggestions": ["<suggestion>", ...]}}, ...]}}.
+
+{separator}{items}"""
+
+REMEDIATION_TEMPLATE = """{competence_block}
+
+Générez un plan de remédiation personnalisé pour l'élève et les lacunes indiqués après le séparateur, pour cette compétence.
+Le plan doit inclure des exercices spécifiques, des ressources et des étapes claires pour améliorer la maîtrise de cette compétence.
+
+{separator}
+Élève: {name}
+Lacunes: {identified_gaps}"""
+
+ENRICHMENT_TEMPLATE = """{competence_block}
+
+Générez un plan d'approfondissement pour l'élève indiqué après le séparateur, qui a démontré une excellente maîtrise de cette compétence.
+Le plan doit inclure des projets avancés, des lectures complémentaires ou des défis créatifs pour stimuler son intérêt et étendre ses connaissances.
+
+{separator}
+Élève: {name}"""
+
+def _competence_block(competence):
+    indicators = "\n- ".join(sorted(competence["indicateurs"]))
+    return f"Compétence '{competence['name']}' ({competence['description']})\nIndicateurs de la compétence:\n- {indicators}"
+
+@functools.lru_cache(maxsize=8)
+def _index_referentiels(path, mtime):
+    # Index et blocs statiques construits une fois par version du fichier, partagés par toutes les instances
+    data = load_yaml(path)
+    by_id = {c["id"]: c for r in data["referentiels"] for c in r["competences"]}
+    return data, by_id, {cid: _competence_block(c) for cid, c in by_id.items()}
+
+def _load_referentiels(path):
+    return _index_referentiels(path, os.path.getmtime(path))
 
 class AcademicComplianceAgent:
-    def __init__(self, referentiels_path="data-schemas/referentiels.yaml"):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.referentiels = self._load_referentiels(referentiels_path)
+    def __init__(self, referentiels_path="data-schemas/referentiels.yaml", models=None):
+        self.client = get_openai()
+        self.aclient = get_async_openai()
+        # Modèle par niveau de criticité, surchargeable niveau par niveau
+        self.models = {**MODEL_TIERS, **(models or {})}
+        # Index par ID (recherche en O(1)) et bloc statique de chaque compétence : octet pour octet identique
+        # d'un appel à l'autre (indicateurs triés) pour bénéficier du cache de prompt côté fournisseur
+        self.referentiels, self._by_id, self._competence_blocks = _load_referentiels(referentiels_path)
+        # Requêtes différées vers l'API Batch (vérifications en masse non interactives)
+        self.batch_queue = BatchQueue(self.client)
+
+    def _anonymized_prompt(self, request, name):
+        # Le nom de l'élève est retiré avant l'embedding pour que les plans soient réutilisables d'un élève à l'autre
+        prompt = request["messages"][-1]["content"]
+        return prompt.replace(name, NAME_PLACEHOLDER) if name else prompt
+
+    def _compliance_request(self, content_to_check, competence, complexity=None):
+        prompt = COMPLIANCE_TEMPLATE.format_map({
+            "competence_block": self._competence_blocks[competence["id"]],
+            "separator": DYNAMIC_SEPARATOR,
+            "content": content_to_check,
+        })
+        return {
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "Vous êtes un assistant expert en conformité académique.",
+                },
+                {
+                    "role": "user",
+                    "content": prompt,
+                }
+            ],
+            "model": pick_model(prompt, self.models, "compliance", complexity),
+            "temperature": 0,
+            "max_tokens": MAX_TOKENS["compliance"],
+            "response_format": {"type": "json_object"},
+        }
+
+    def _compliance_batch_request(self, contents, competence, complexity=None):
+        prompt = COMPLIANCE_BATCH_TEMPLATE.format_map({
+            "competence_block": self._competence_blocks[competence["id"]],
+            "separator": DYNAMIC_SEPARATOR,
+            "items": "".join(f"\n\n=== ITEM {i} ===\n{content}" for i, content in enumerate(contents)),
+        })
+        return {
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "Vous êtes un assistant expert en conformité académique.",
+                },
+                {
+                    "role": "user",
+                    "content": prompt,
+                }
+            ],
+            "model": pick_model(prompt, self.models, "compliance", complexity),
+            "temperature": 0,
+            "max_tokens": min(COMPLIANCE_ITEM_MAX_TOKENS * len(contents), MAX_OUTPUT_TOKENS),
+            "response_format": {"type": "json_object"},
+        }
+
+    def _parse_batch_evaluations(self, result, count, offset):
+        if result["status"] != "success":
+            return result
+        try:
+            by_id = {int(item["id"]): item for item in parse_json_response(result["evaluations"])["evaluations"]}
+        except (ValueError, TypeError, KeyError) as e:
+            return {"status": "error", "message": f"Réponse groupée illisible : {e}"}
+        evaluations = []
+        for i in range(count):
+            item = by_id.get(i)
+            if item is None:
+                evaluations.append({"id": offset + i, "status": "error", "message": "Évaluation absente de la réponse."})
+            else:
+                evaluations.append({"id": offset + i, "status": item.get("status"), "suggestions": item.get("suggestions")})
+        return {"status": "success", "evaluations": evaluations}
+
+    def _remediation_request(self, student_data, competence, identified_gaps, complexity=None):
+        prompt = REMEDIATION_TEMPLATE.format_map({
+            "competence_block": self._competence_blocks[competence["id"]],
+            "separator": DYNAMIC_SEPARATOR,
+            "name": student_data.get("name", "cet élève"),
+            "identified_gaps": identified_gaps,
+        })
+        return {
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "Vous êtes un tuteur IA expert en pédagogie.",
+                },
+                {
+                    "role": "user",
+                    "content": prompt,
+                }
+            ],
+            "model": pick_model(prompt, self.models, "compliance", complexity),
+            "temperature": 0,
+            "max_tokens": MAX_TOKENS["compliance"],
+        }
 
-    def _load_referentiels(self, path):
-        with open(path, "r", encoding="utf-8") as file:
-            return yaml.safe_load(file)
+    def _enrichment_request(self, student_data, competence, complexity=None):
+        prompt = ENRICHMENT_TEMPLATE.format_map({
+            "competence_block": self._competence_blocks[competence["id"]],
+            "separator": DYNAMIC_SEPARATOR,
+            "name": student_data.get("name", "cet élève"),
+        })
+        return {
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "Vous êtes un tuteur IA expert en pédagogie et en développement de talents.",
+                },
+                {
+                    "role": "user",
+                    "content": prompt,
+                }
+            ],
+            "model": pick_model(prompt, self.models, "content", complexity),
+            "temperature": 0,
+            "max_tokens": MAX_TOKENS["content"],
+        }
 
-    def check_compliance(self, content_to_check, competence_id):
+    def check_compliance(self, content_to_check, competence_id, complexity=None):
         """
         Vérifie la conformité d'un contenu pédagogique par rapport à une compétence donnée.
         Args:
             content_to_check (str): Le contenu pédagogique à vérifier (par exemple, un extrait de cours, un exercice).
             competence_id (str): L'ID de la compétence du référentiel (ex: "D1.3").
+            complexity (str, optional): "high" pour escalader vers le modèle le plus capable, "low" pour le modèle économique.
         Returns:
-            dict: Un dictionnaire contenant le statut de conformité et des suggestions.
+            dict: {"status": "success", "evaluation": {"status", "evaluation", "suggestions"}} ou un dictionnaire d'erreur.
         """
-        competence = next((c for r in self.referentiels["referentiels"] for c in r["competences"] if c["id"] == competence_id), None)
+        competence = self._by_id.get(competence_id)
         if not competence:
             return {"status": "error", "message": f"Compétence {competence_id} non trouvée dans les référentiels."}
+        request = self._compliance_request(content_to_check, competence, complexity)
+        result = semantic_complete(
+            self.client, request, "evaluation", "la vérification de conformité",
+            f"compliance:{competence_id}:{request['model']}", request["messages"][-1]["content"],
+        )
+        return parse_json_result(result, "evaluation")
 
-        prompt = f"""
-        En tant qu'expert en conformité académique, analysez le contenu pédagogique suivant et déterminez s'il est conforme aux indicateurs de la compétence '{competence["name"]}' ({competence["description"]}).
-        Indicateurs de la compétence:
-        {'- '.join(competence['indicateurs'])}
-
-        Contenu pédagogique à vérifier:
-        {content_to_check}
+    async def acheck_compliance(self, content_to_check, competence_id, complexity=None):
+        """
+        Variante asynchrone de check_compliance.
+        """
+        competence = self._by_id.get(competence_id)
+        if not competence:
+            return {"status": "error", "message": f"Compétence {competence_id} non trouvée dans les référentiels."}
+        request = self._compliance_request(content_to_check, competence, complexity)
+        result = await asemantic_complete(
+            self.aclient, request, "evaluation", "la vérification de conformité",
+            f"compliance:{competence_id}:{request['model']}", request["messages"][-1]["content"],
+        )
+        return parse_json_result(result, "evaluation")
 
-        Fournissez une évaluation claire (Conforme, Partiellement Conforme, Non Conforme) et des suggestions spécifiques pour améliorer la conformité si nécessaire.
+    def check_compliance_batch(self, contents, competence_id, complexity=None):
         """
+        Vérifie la conformité de plusieurs contenus en regroupant jusqu'à COMPLIANCE_BATCH_SIZE contenus par appel.
+        Args:
+            contents (list): Les contenus pédagogiques à vérifier.
+            competence_id (str): L'ID de la compétence du référentiel (ex: "D1.3").
+            complexity (str, optional): "high" pour escalader vers le modèle le plus capable, "low" pour le modèle économique.
+        Returns:
+            dict: {"status": "success", "evaluations": [{"id", "status", "suggestions"}, ...]} dans l'ordre de contents.
+        """
+        competence = self._by_id.get(competence_id)
+        if not competence:
+            return {"status": "error", "message": f"Compétence {competence_id} non trouvée dans les référentiels."}
+        evaluations = []
+        for start in range(0, len(contents), COMPLIANCE_BATCH_SIZE):
+            chunk = contents[start:start + COMPLIANCE_BATCH_SIZE]
+            request = self._compliance_batch_request(chunk, competence, complexity)
+            result = complete(self.client, request, "evaluations", "la vérification de conformité groupée")
+            parsed = self._parse_batch_evaluations(result, len(chunk), start)
+            if parsed["status"] != "success":
+                return parsed
+            evaluations.extend(parsed["evaluations"])
+        return {"status": "success", "evaluations": evaluations}
 
-        try:
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Vous êtes un assistant expert en conformité académique.",
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    }
-                ],
-                model="gpt-4", # Utilisation d'un modèle plus avancé pour la conformité
+    async def acheck_compliance_batch(self, contents, competence_id, complexity=None):
+        """
+        Variante asynchrone de check_compliance_batch (les lots sont envoyés en parallèle).
+        """
+        competence = self._by_id.get(competence_id)
+        if not competence:
+            return {"status": "error", "message": f"Compétence {competence_id} non trouvée dans les référentiels."}
+        starts = range(0, len(contents), COMPLIANCE_BATCH_SIZE)
+        results = await asyncio.gather(*(
+            acomplete(
+                self.aclient,
+                self._compliance_batch_request(contents[start:start + COMPLIANCE_BATCH_SIZE], competence, complexity),
+                "evaluations",
+                "la vérification de conformité groupée",
             )
-            response = chat_completion.choices[0].message.content
-            return {"status": "success", "evaluation": response}
-        except Exception as e:
-            return {"status": "error", "message": f"Erreur lors de la vérification de conformité : {e}"}
+            for start in starts
+        ))
+        evaluations = []
+        for start, result in zip(starts, results):
+            parsed = self._parse_batch_evaluations(result, len(contents[start:start + COMPLIANCE_BATCH_SIZE]), start)
+            if parsed["status"] != "success":
+                return parsed
+            evaluations.extend(parsed["evaluations"])
+        return {"status": "success", "evaluations": evaluations}
+
+    def queue_compliance(self, content_to_check, competence_id, complexity=None):
+        """
+        Met en file une vérification de conformité pour l'API Batch.
+        Returns:
+            str: Le custom_id permettant de retrouver l'évaluation dans batch_queue.collect(),
+                décodée comme celle de check_compliance.
+        """
+        competence = self._by_id.get(competence_id)
+        if not competence:
+            raise ValueError(f"Compétence {competence_id} non trouvée dans les référentiels.")
+        request = self._compliance_request(content_to_check, competence, complexity)
+        return self.batch_queue.add(request, "evaluation", parse_json_result)
 
-    def generate_remediation_plan(self, student_data, competence_id, identified_gaps):
+    def generate_remediation_plan(self, student_data, competence_id, identified_gaps, complexity=None):
         """
         Génère un plan de remédiation personnalisé pour un élève.
         Args:
             student_data (dict): Données de l'élève (nom, niveau, etc.).
             competence_id (str): L'ID de la compétence concernée.
             identified_gaps (str): Description des lacunes identifiées.
+            complexity (str, optional): "high" pour escalader vers le modèle le plus capable, "low" pour le modèle économique.
         Returns:
             dict: Un dictionnaire contenant le plan de remédiation.
         """
-        competence = next((c for r in self.referentiels["referentiels"] for c in r["competences"] if c["id"] == competence_id), None)
+        competence = self._by_id.get(competence_id)
         if not competence:
             return {"status": "error", "message": f"Compétence {competence_id} non trouvée."}
+        request = self._remediation_request(student_data, competence, identified_gaps, complexity)
+        name = student_data.get("name")
+        return semantic_complete(
+            self.client, request, "plan", "la génération du plan de remédiation",
+            f"remediation:{competence_id}:{request['model']}", self._anonymized_prompt(request, name), name,
+        )
 
-        prompt = f"""
-        Générez un plan de remédiation personnalisé pour l'élève {student_data.get('name', 'cet élève')}, qui a des lacunes identifiées suivantes pour la compétence '{competence["name"]}' ({competence["description"]}) :
-        Lacunes: {identified_gaps}
-
-        Le plan doit inclure des exercices spécifiques, des ressources et des étapes claires pour améliorer la maîtrise de cette compétence.
+    async def agenerate_remediation_plan(self, student_data, competence_id, identified_gaps, complexity=None):
         """
-        try:
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Vous êtes un tuteur IA expert en pédagogie.",
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    }
-                ],
-                model="gpt-4",
-            )
-            response = chat_completion.choices[0].message.content
-            return {"status": "success", "plan": response}
-        except Exception as e:
-            return {"status": "error", "message": f"Erreur lors de la génération du plan de remédiation : {e}"}
+        Variante asynchrone de generate_remediation_plan.
+        """
+        competence = self._by_id.get(competence_id)
+        if not competence:
+            return {"status": "error", "message": f"Compétence {competence_id} non trouvée."}
+        request = self._remediation_request(student_data, competence, identified_gaps, complexity)
+        name = student_data.get("name")
+        return await asemantic_complete(
+            self.aclient, request, "plan", "la génération du plan de remédiation",
+            f"remediation:{competence_id}:{request['model']}", self._anonymized_prompt(request, name), name,
+        )
 
-    def generate_enrichment_plan(self, student_data, competence_id):
+    def generate_enrichment_plan(self, student_data, competence_id, complexity=None):
         """
         Génère un plan d'approfondissement pour un élève ayant maîtrisé une compétence.
         Args:
             student_data (dict): Données de l'élève.
             competence_id (str): L'ID de la compétence concernée.
+            complexity (str, optional): "high" pour escalader vers le modèle le plus capable, "low" pour le modèle économique.
         Returns:
             dict: Un dictionnaire contenant le plan d'approfondissement.
         """
-        competence = next((c for r in self.referentiels["referentiels"] for c in r["competences"] if c["id"] == competence_id), None)
+        competence = self._by_id.get(competence_id)
         if not competence:
             return {"status": "error", "message": f"Compétence {competence_id} non trouvée."}
+        request = self._enrichment_request(student_data, competence, complexity)
+        return complete(self.client, request, "plan", "la génération du plan d'approfondissement")
 
-        prompt = f"""
-        Générez un plan d'approfondissement pour l'élève {student_data.get('name', 'cet élève')}, qui a démontré une excellente maîtrise de la compétence '{competence["name"]}' ({competence["description"]}).
-        Le plan doit inclure des projets avancés, des lectures complémentaires ou des défis créatifs pour stimuler son intérêt et étendre ses connaissances.
+    async def agenerate_enrichment_plan(self, student_data, competence_id, complexity=None):
         """
-        try:
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Vous êtes un tuteur IA expert en pédagogie et en développement de talents.",
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    }
-                ],
-                model="gpt-4",
-            )
-            response = chat_completion.choices[0].message.content
-            return {"status": "success", "plan": response}
-        except Exception as e:
-            return {"status": "error", "message": f"Erreur lors de la génération du plan d'approfondissement : {e}"}
+        Variante asynchrone de generate_enrichment_plan.
+        """
+        competence = self._by_id.get(competence_id)
+        if not competence:
+            return {"status": "error", "message": f"Compétence {competence_id} non trouvée."}
+        request = self._enrichment_request(student_data, competence, complexity)
+        return await acomplete(self.aclient, request, "plan", "la génération du plan d'approfondissement")
 
 if __name__ == "__main__":
     # Exemple d'utilisation (pour les tests locaux)
@@ -152,3 +369,9 @@ if __name__ == "__main__":
     enrichment_plan = agent.generate_enrichment_plan(student, "D1.3")
     print("\n--- Plan d'Approfondissement ---")
     print(enrichment_plan)
+
+    # Test de vérification concurrente sur plusieurs contenus
+    contents = [content, "Les élèves calculent l'aire d'un disque.", "Lecture d'un texte de Victor Hugo."]
+    results = asyncio.run(run_many(agent.acheck_compliance(c, "D1.3") for c in contents))
+    print("\n--- Vérifications Concurrentes ---")
+    print(results)
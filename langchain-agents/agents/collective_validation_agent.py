@@ -1,63 +1,182 @@
 import os
-import yaml
-from openai import OpenAI
+import sys
 
-class CollectiveValidationAgent:
-    def __init__(self, teachers_path="config/teachers.yaml"):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.teachers_config = self._load_config(teachers_path)
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from tools.clients import get_async_openai, get_openai  # noqa: E402
+from tools.completions import DYNAMIC_SEPARATOR, acomplete, complete, parse_json_response  # noqa: E402
+from tools.models import MAX_OUTPUT_TOKENS, MAX_TOKENS, MODEL_TIERS, pick_model  # noqa: E402
+from tools.yaml_cache import load_yaml  # noqa: E402
 
-    def _load_config(self, path):
-        with open(path, "r", encoding="utf-8") as file:
-            return yaml.safe_load(file)
+# Codes numériques des statuts de progression ; un statut absent ou inconnu compte comme non acquis
+STATUS_CODES = {"non acquis": 0, "en cours": 1, "maîtrisé": 2}
+MASTERED = STATUS_CODES["maîtrisé"]
+
+def build_progress_matrix(student_progress_data, competence_ids=None):
+    """
+    Convertit la progression des élèves en tableaux NumPy (un par compétence), à construire une fois
+    puis à réutiliser pour des vérifications de maîtrise vectorisées.
+    Args:
+        student_progress_data (list): Une liste de dictionnaires {competence_id: statut}, un par élève.
+        competence_ids (list, optional): Les compétences à extraire (par défaut, toutes celles rencontrées).
+    Returns:
+        dict: {competence_id: np.ndarray d'int8 de codes STATUS_CODES, un élément par élève}.
+    """
+    if competence_ids is None:
+        competence_ids = list(dict.fromkeys(cid for student in student_progress_data for cid in student))
+    count = len(student_progress_data)
+    return {
+        cid: np.fromiter(
+            (STATUS_CODES.get(student.get(cid), 0) for student in student_progress_data), dtype=np.int8, count=count
+        )
+        for cid in competence_ids
+    }
+
+class CollectiveValidationAgent:
+    def __init__(self, teachers_path="config/teachers.yaml", models=None):
+        self.client = get_openai()
+        self.aclient = get_async_openai()
+        # Modèle par niveau de criticité, surchargeable niveau par niveau
+        self.models = {**MODEL_TIERS, **(models or {})}
+        self.teachers_config = load_yaml(teachers_path)
 
     def check_collective_mastery(self, student_progress_data, competence_id, threshold=0.9):
         """
         Vérifie si une compétence a atteint le seuil de maîtrise collective.
         Args:
-            student_progress_data (list): Une liste de dictionnaires représentant la progression de chaque élève.
+            student_progress_data (list | dict): Une liste de dictionnaires représentant la progression de chaque élève,
+                ou la matrice déjà construite par build_progress_matrix.
             competence_id (str): L'ID de la compétence à vérifier.
             threshold (float): Le seuil de maîtrise (par défaut 90%).
         Returns:
             bool: True si le seuil est atteint, False sinon.
         """
-        mastery_count = sum(1 for student in student_progress_data if student.get(competence_id) == "maîtrisé")
-        mastery_ratio = mastery_count / len(student_progress_data) if student_progress_data else 0
-        return mastery_ratio >= threshold
+        ratio = self.check_collective_mastery_many(student_progress_data, [competence_id])[competence_id]
+        return ratio >= threshold
+
+    def check_collective_mastery_many(self, student_progress_data, competence_ids):
+        """
+        Calcule en une passe vectorisée le taux de maîtrise de plusieurs compétences.
+        Args:
+            student_progress_data (list | dict): La progression des élèves (liste de dictionnaires)
+                ou la matrice construite par build_progress_matrix.
+            competence_ids (list): Les IDs des compétences à évaluer.
+        Returns:
+            dict: {competence_id: taux de maîtrise entre 0 et 1}.
+        """
+        if not isinstance(student_progress_data, dict):
+            student_progress_data = build_progress_matrix(student_progress_data, competence_ids)
+        count = len(next(iter(student_progress_data.values()))) if student_progress_data else 0
+        if count == 0:
+            return {cid: 0.0 for cid in competence_ids}
+        missing = np.zeros(count, dtype=np.int8)
+        statuses = np.vstack([student_progress_data.get(cid, missing) for cid in competence_ids])
+        ratios = (statuses == MASTERED).mean(axis=1)
+        return {cid: float(ratio) for cid, ratio in zip(competence_ids, ratios)}
+
+    def _collective_assessment_request(self, competence_id, student_level, complexity=None):
+        prompt = f"""En tant qu'ingénieur pédagogique, créez un devoir de validation collective pour la compétence et le niveau de classe indiqués après le séparateur.
+Le devoir doit être concis, pertinent et permettre de valider rapidement la maîtrise de la compétence par l'ensemble de la classe.
+Il peut prendre la forme d'un QCM, d'un problème court ou d'une étude de cas simple.
+
+{DYNAMIC_SEPARATOR}
+Compétence (ID): {competence_id}
+Niveau général de la classe: {student_level}"""
+        return {
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "Vous êtes un ingénieur pédagogique spécialisé dans la création d'évaluations collectives.",
+                },
+                {
+                    "role": "user",
+                    "content": prompt,
+                }
+            ],
+            "model": pick_model(prompt, self.models, "content", complexity),
+            "temperature": 0,
+            "max_tokens": MAX_TOKENS["content"],
+        }
+
+    def _collective_assessment_batch_request(self, competence_ids, student_level, complexity=None):
+        competences = "\n".join(f"- {competence_id}" for competence_id in competence_ids)
+        prompt = f"""En tant qu'ingénieur pédagogique, créez un devoir de validation collective pour chacune des compétences indiquées après le séparateur, au niveau de classe indiqué.
+Chaque devoir doit être concis, pertinent et permettre de valider rapidement la maîtrise de la compétence par l'ensemble de la classe.
+Il peut prendre la forme d'un QCM, d'un problème court ou d'une étude de cas simple.
+Répondez uniquement par un objet JSON de la forme {{"assessments": [{{"id": "<ID de la compétence>", "assessment": "<devoir>"}}, ...]}}.
+
+{DYNAMIC_SEPARATOR}
+Niveau général de la classe: {student_level}
+Compétences (ID):
+{competences}"""
+        return {
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "Vous êtes un ingénieur pédagogique spécialisé dans la création d'évaluations collectives.",
+                },
+                {
+                    "role": "user",
+                    "content": prompt,
+                }
+            ],
+            "model": pick_model(prompt, self.models, "content", complexity),
+            "temperature": 0,
+            "max_tokens": min(MAX_TOKENS["content"] * len(competence_ids), MAX_OUTPUT_TOKENS),
+            "response_format": {"type": "json_object"},
+        }
 
-    def generate_collective_assessment(self, competence_id, student_level="moyen"):
+    def _parse_batch_assessments(self, result, competence_ids):
+        if result["status"] != "success":
+            return result
+        try:
+            by_id = {str(item["id"]): item.get("assessment") for item in parse_json_response(result["assessments"])["assessments"]}
+        except (ValueError, TypeError, KeyError) as e:
+            return {"status": "error", "message": f"Réponse groupée illisible : {e}"}
+        return {"status": "success", "assessments": {competence_id: by_id.get(competence_id) for competence_id in competence_ids}}
+
+    def generate_collective_assessment(self, competence_id, student_level="moyen", complexity=None):
         """
         Génère un devoir de validation collective adapté au niveau de la classe.
         Args:
             competence_id (str): L'ID de la compétence à évaluer.
             student_level (str): Le niveau général de la classe pour cette compétence.
+            complexity (str, optional): "high" pour escalader vers le modèle le plus capable, "low" pour le modèle économique.
         Returns:
             dict: Un dictionnaire contenant le devoir de validation.
         """
-        prompt = f"""
-        En tant qu'ingénieur pédagogique, créez un devoir de validation collective pour la compétence avec l'ID '{competence_id}'.
-        Le niveau général de la classe est '{student_level}'.
-        Le devoir doit être concis, pertinent et permettre de valider rapidement la maîtrise de la compétence par l'ensemble de la classe.
-        Il peut prendre la forme d'un QCM, d'un problème court ou d'une étude de cas simple.
+        request = self._collective_assessment_request(competence_id, student_level, complexity)
+        return complete(self.client, request, "assessment", "la génération de l'évaluation collective")
+
+    async def agenerate_collective_assessment(self, competence_id, student_level="moyen", complexity=None):
         """
-        try:
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Vous êtes un ingénieur pédagogique spécialisé dans la création d'évaluations collectives.",
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    }
-                ],
-                model="gpt-4",
-            )
-            response = chat_completion.choices[0].message.content
-            return {"status": "success", "assessment": response}
-        except Exception as e:
-            return {"status": "error", "message": f"Erreur lors de la génération de l'évaluation collective : {e}"}
+        Variante asynchrone de generate_collective_assessment.
+        """
+        request = self._collective_assessment_request(competence_id, student_level, complexity)
+        return await acomplete(self.aclient, request, "assessment", "la génération de l'évaluation collective")
+
+    def generate_collective_assessment_batch(self, competence_ids, student_level="moyen", complexity=None):
+        """
+        Génère en un seul appel les devoirs de validation collective de plusieurs compétences.
+        Args:
+            competence_ids (list): Les IDs des compétences à évaluer.
+            student_level (str): Le niveau général de la classe.
+            complexity (str, optional): "high" pour escalader vers le modèle le plus capable, "low" pour le modèle économique.
+        Returns:
+            dict: {"status": "success", "assessments": {competence_id: devoir ou None}}.
+        """
+        request = self._collective_assessment_batch_request(competence_ids, student_level, complexity)
+        result = complete(self.client, request, "assessments", "la génération groupée des évaluations collectives")
+        return self._parse_batch_assessments(result, competence_ids)
+
+    async def agenerate_collective_assessment_batch(self, competence_ids, student_level="moyen", complexity=None):
+        """
+        Variante asynchrone de generate_collective_assessment_batch.
+        """
+        request = self._collective_assessment_batch_request(competence_ids, student_level, complexity)
+        result = await acomplete(self.aclient, request, "assessments", "la génération groupée des évaluations collectives")
+        return self._parse_batch_assessments(result, competence_ids)
 
 if __name__ == "__main__":
     # Exemple d'utilisation (pour les tests locaux)
@@ -75,6 +194,10 @@ if __name__ == "__main__":
     print("\n--- Vérification de la Maîtrise Collective ---")
     print(f"La compétence D1.3 a-t-elle atteint le seuil de maîtrise ? {'Oui' if is_mastered else 'Non'}")
 
+    # Test de vérification vectorisée sur plusieurs compétences (matrice construite une seule fois)
+    progress_matrix = build_progress_matrix(progress_data)
+    print(agent.check_collective_mastery_many(progress_matrix, ["D1.3", "D2.1"]))
+
     # Test de génération d'une évaluation collective
     if is_mastered:
         assessment = agent.generate_collective_assessment("D1.3")
@@ -1,13 +1,127 @@
+import asyncio
+import json
 import os
-from openai import OpenAI # DeepSeek utilise une API compatible OpenAI
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from tools.clients import get_async_deepseek, get_deepseek  # noqa: E402
+from tools.completions import acomplete, complete  # noqa: E402
+from tools.ratelimit import count_tokens  # noqa: E402
+
+DEEPSEEK_MODEL = "deepseek-coder"
+# Plafond de tokens générés par les analyses DeepSeek
+DEEPSEEK_MAX_TOKENS = 2000
+# Au-delà, analyze_data_for_insights découpe les données en fenêtres analysées séparément (map-reduce)
+INSIGHTS_WINDOW_TOKENS = 24_000
+
+def _split_data_set(data_set, window_tokens=INSIGHTS_WINDOW_TOKENS):
+    # Un tableau JSON est découpé par éléments, tout autre texte par lignes en répétant
+    # la première (l'en-tête d'un CSV) en tête de chaque fenêtre
+    if count_tokens(data_set, DEEPSEEK_MODEL) <= window_tokens:
+        return [data_set]
+    try:
+        items = json.loads(data_set)
+    except ValueError:
+        items = None
+    if isinstance(items, list):
+        header = None
+        pieces = [json.dumps(item, ensure_ascii=False) for item in items]
+    else:
+        header, *pieces = data_set.splitlines()
+    budget = window_tokens - (count_tokens(header, DEEPSEEK_MODEL) if header else 0)
+    chunks, chunk, used = [], [], 0
+    for piece in pieces:
+        size = count_tokens(piece, DEEPSEEK_MODEL) + 1
+        if chunk and used + size > budget:
+            chunks.append(chunk)
+            chunk, used = [], 0
+        chunk.append(piece)
+        used += size
+    if chunk:
+        chunks.append(chunk)
+    if header is None:
+        return ["[" + ", ".join(chunk) + "]" for chunk in chunks]
+    return ["\n".join([header] + chunk) for chunk in chunks]
 
 class DeepSeekTechnicalAgent:
     def __init__(self):
         # L'API DeepSeek est compatible avec l'API OpenAI, donc nous utilisons le même client
-        self.client = OpenAI(
-            api_key=os.getenv("DEEPSEEK_API_KEY"),
-            base_url="https://api.deepseek.com/v1"
-         )
+        self.client = get_deepseek()
+        self.aclient = get_async_deepseek()
+
+    def _learning_path_request(self, student_data, curriculum_data):
+        prompt = f"""
+        En tant qu'expert en optimisation pédagogique et analyse de données, analysez les données de l'élève suivantes :
+        {student_data}
+
+        Et les données du curriculum :
+        {curriculum_data}
+
+        Proposez un parcours d'apprentissage optimisé pour cet élève, en identifiant les compétences prioritaires à renforcer ou à approfondir, et en suggérant une séquence logique d'apprentissage.
+        """
+        return {
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "Vous êtes un agent d'optimisation de parcours d'apprentissage.",
+                },
+                {
+                    "role": "user",
+                    "content": prompt,
+                }
+            ],
+            "model": DEEPSEEK_MODEL, # Ou un autre modèle DeepSeek pertinent
+            "temperature": 0,
+            "max_tokens": DEEPSEEK_MAX_TOKENS,
+        }
+
+    def _insights_request(self, data_set, analysis_request, window=None):
+        # window = (i, n) : les données ne sont qu'une fenêtre d'un ensemble plus large, dont
+        # les résultats partiels seront fusionnés par _insights_reduce_request
+        partial = f"""
+        Ces données sont la fenêtre {window[0]}/{window[1]} d'un ensemble plus large : en plus de vos observations,
+        fournissez des résultats intermédiaires agrégeables (effectifs, sommes, minimums, maximums).
+        """ if window else ""
+        prompt = f"""
+        En tant qu'analyste de données expérimenté, analysez l'ensemble de données suivant :
+        {data_set}
+
+        Et répondez à la question/effectuez l'analyse suivante :
+        {analysis_request}
+        {partial}
+        Fournissez des insights clairs, des tendances identifiées et des recommandations basées sur les données.
+        """
+        return self._analyst_request(prompt)
+
+    def _insights_reduce_request(self, partial_insights, analysis_request):
+        analyses = "\n\n".join(f"--- Fenêtre {i} ---\n{insights}" for i, insights in enumerate(partial_insights, 1))
+        prompt = f"""
+        En tant qu'analyste de données expérimenté, voici les analyses partielles des fenêtres successives d'un même ensemble de données :
+        {analyses}
+
+        En combinant ces résultats intermédiaires, répondez à la question/effectuez l'analyse suivante sur l'ensemble complet :
+        {analysis_request}
+
+        Fournissez des insights clairs, des tendances identifiées et des recommandations basées sur les données.
+        """
+        return self._analyst_request(prompt)
+
+    def _analyst_request(self, prompt):
+        return {
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "Vous êtes un expert en analyse de données.",
+                },
+                {
+                    "role": "user",
+                    "content": prompt,
+                }
+            ],
+            "model": DEEPSEEK_MODEL,
+            "temperature": 0,
+            "max_tokens": DEEPSEEK_MAX_TOKENS,
+        }
 
     def optimize_learning_path(self, student_data, curriculum_data):
         """
@@ -18,70 +132,62 @@ class DeepSeekTechnicalAgent:
         Returns:
             dict: Un dictionnaire contenant le parcours optimisé.
         """
-        prompt = f"""
-        En tant qu'expert en optimisation pédagogique et analyse de données, analysez les données de l'élève suivantes :
-        {student_data}
-
-        Et les données du curriculum :
-        {curriculum_data}
+        request = self._learning_path_request(student_data, curriculum_data)
+        return complete(self.client, request, "optimized_path", "l'optimisation du parcours")
 
-        Proposez un parcours d'apprentissage optimisé pour cet élève, en identifiant les compétences prioritaires à renforcer ou à approfondir, et en suggérant une séquence logique d'apprentissage.
+    async def aoptimize_learning_path(self, student_data, curriculum_data):
         """
-        try:
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Vous êtes un agent d'optimisation de parcours d'apprentissage.",
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    }
-                ],
-                model="deepseek-coder", # Ou un autre modèle DeepSeek pertinent
-            )
-            response = chat_completion.choices[0].message.content
-            return {"status": "success", "optimized_path": response}
-        except Exception as e:
-            return {"status": "error", "message": f"Erreur lors de l'optimisation du parcours : {e}"}
+        Variante asynchrone de optimize_learning_path.
+        """
+        request = self._learning_path_request(student_data, curriculum_data)
+        return await acomplete(self.aclient, request, "optimized_path", "l'optimisation du parcours")
 
     def analyze_data_for_insights(self, data_set, analysis_request):
         """
         Analyse un ensemble de données pour en extraire des insights.
+        Les ensembles plus grands que INSIGHTS_WINDOW_TOKENS sont analysés par fenêtres, puis les résultats fusionnés.
         Args:
             data_set (str): Les données à analyser (par exemple, au format JSON ou CSV).
             analysis_request (str): La question ou le type d'analyse à effectuer.
         Returns:
             dict: Un dictionnaire contenant les insights extraits.
         """
-        prompt = f"""
-        En tant qu'analyste de données expérimenté, analysez l'ensemble de données suivant :
-        {data_set}
+        windows = _split_data_set(data_set)
+        if len(windows) == 1:
+            request = self._insights_request(data_set, analysis_request)
+            return complete(self.client, request, "insights", "l'analyse des données")
+        partials = []
+        for i, window in enumerate(windows, 1):
+            request = self._insights_request(window, analysis_request, (i, len(windows)))
+            result = complete(self.client, request, "insights", "l'analyse des données")
+            if result["status"] != "success":
+                return result
+            partials.append(result["insights"])
+        request = self._insights_reduce_request(partials, analysis_request)
+        return complete(self.client, request, "insights", "la synthèse de l'analyse des données")
 
-        Et répondez à la question/effectuez l'analyse suivante :
-        {analysis_request}
-
-        Fournissez des insights clairs, des tendances identifiées et des recommandations basées sur les données.
+    async def aanalyze_data_for_insights(self, data_set, analysis_request):
+        """
+        Variante asynchrone de analyze_data_for_insights (les fenêtres sont analysées en parallèle).
         """
-        try:
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Vous êtes un expert en analyse de données.",
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    }
-                ],
-                model="deepseek-coder",
+        windows = _split_data_set(data_set)
+        if len(windows) == 1:
+            request = self._insights_request(data_set, analysis_request)
+            return await acomplete(self.aclient, request, "insights", "l'analyse des données")
+        results = await asyncio.gather(*(
+            acomplete(
+                self.aclient,
+                self._insights_request(window, analysis_request, (i, len(windows))),
+                "insights",
+                "l'analyse des données",
             )
-            response = chat_completion.choices[0].message.content
-            return {"status": "success", "insights": response}
-        except Exception as e:
-            return {"status": "error", "message": f"Erreur lors de l'analyse des données : {e}"}
+            for i, window in enumerate(windows, 1)
+        ))
+        for result in results:
+            if result["status"] != "success":
+                return result
+        request = self._insights_reduce_request([result["insights"] for result in results], analysis_request)
+        return await acomplete(self.aclient, request, "insights", "la synthèse de l'analyse des données")
 
 if __name__ == "__main__":
     # Exemple d'utilisation (pour les tests locaux)
@@ -95,7 +201,7 @@ if __name__ == "__main__":
     print(optimized_path_result)
 
     # Test d'analyse de données
-    data_example = "[{"student": "Alice", "score": 85}, {"student": "Bob", "score": 60}, {"student": "Charlie", "score": 92}]"
+    data_example = '[{"student": "Alice", "score": 85}, {"student": "Bob", "score": 60}, {"student": "Charlie", "score": 92}]'
     analysis_request_example = "Quelle est la moyenne des scores et qui a le score le plus élevé ?"
     insights_result = agent.analyze_data_for_insights(data_example, analysis_request_example)
     print("\n--- Insights de données ---")
@@ -1,11 +1,94 @@
 import os
-import google.generativeai as genai
+import sys
+
+from google.api_core.exceptions import DeadlineExceeded, InternalServerError, ResourceExhausted, ServiceUnavailable
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from tools.clients import get_gemini  # noqa: E402
+from tools.completions import MAX_ATTEMPTS, MAX_BACKOFF_SECONDS, parse_json_response  # noqa: E402
+
+# Réponses JSON déterministes et bornées (mode JSON natif : pas d'échec de parsing sur de la prose)
+GENERATION_CONFIG = {"response_mime_type": "application/json", "temperature": 0, "max_output_tokens": 1024}
+
+# Erreurs transitoires de l'API Gemini (quota, indisponibilité, délai, 5xx), rejouées avec backoff
+_retry = retry(
+    retry=retry_if_exception_type((ResourceExhausted, ServiceUnavailable, DeadlineExceeded, InternalServerError)),
+    wait=wait_random_exponential(min=1, max=MAX_BACKOFF_SECONDS),
+    stop=stop_after_attempt(MAX_ATTEMPTS),
+    reraise=True,
+)
 
 class GeminiComplianceAgent:
     def __init__(self):
-        # Configurez votre clé API Gemini
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        self.model = genai.GenerativeModel("gemini-pro")
+        # Le modèle (et la clé API GEMINI_API_KEY) est partagé entre les instances
+        # gemini-1.5-flash : bien moins cher et plus rapide que gemini-pro pour ces tâches de classification
+        self.model = get_gemini(os.getenv("GEMINI_MODEL", "gemini-1.5-flash"))
+
+    def _system_compliance_prompt(self, system_status_report):
+        return f"""
+        En tant qu'expert en conformité des systèmes IA, analysez le rapport de statut du système suivant :
+        {system_status_report}
+
+        Identifiez les éventuels problèmes de conformité, les incohérences ou les risques potentiels.
+        Fournissez une évaluation globale de la conformité du système et des recommandations spécifiques pour améliorer sa robustesse et sa fiabilité.
+        Répondez uniquement par un objet JSON de la forme :
+        {{"status": "<Conforme|Partiellement Conforme|Non Conforme>", "issues": ["<problème>", ...], "recommendations": ["<recommandation>", ...]}}
+        """
+
+    def _orchestration_prompt(self, workflow_description, current_state, actions=None):
+        # Sans liste d'actions, le modèle choisit librement le nom des étapes (appelants antérieurs au DAG)
+        if actions is None:
+            actions_constraint = ""
+            usage_constraint = ""
+        else:
+            actions_constraint = f"\n        Actions disponibles : {', '.join(actions)}\n"
+            usage_constraint = ", en n'utilisant que les actions disponibles"
+        return f"""
+        En tant qu'orchestrateur de workflow IA, analysez la description du workflow suivante :
+        {workflow_description}
+
+        L'état actuel du workflow est :
+        {current_state}
+{actions_constraint}
+        Découpez les étapes restantes en un graphe de dépendances{usage_constraint}.
+        Les étapes indépendantes (par exemple une analyse par élève) doivent être des nœuds distincts sans dépendance entre eux, pour être exécutées en parallèle.
+        Une entrée peut reprendre le résultat d'un nœud précédent sous la forme "$<id du nœud>".
+        Répondez uniquement par un objet JSON de la forme :
+        {{"nodes": [{{"id": "<identifiant>", "action": "<action>", "inputs": {{"<paramètre>": <valeur>}}, "depends_on": ["<id>", ...]}}, ...]}}
+        """
+
+    @_retry
+    def _generate(self, prompt):
+        return self.model.generate_content(prompt, generation_config=GENERATION_CONFIG).text
+
+    @_retry
+    async def _agenerate(self, prompt):
+        response = await self.model.generate_content_async(prompt, generation_config=GENERATION_CONFIG)
+        return response.text
+
+    def _parse_evaluation(self, text):
+        try:
+            return {"status": "success", "evaluation": parse_json_response(text)}
+        except ValueError as e:
+            return {"status": "error", "message": f"Évaluation de conformité illisible : {e}"}
+
+    def _parse_dag(self, text):
+        try:
+            dag = parse_json_response(text)
+            if not isinstance(dag.get("nodes"), list):
+                raise ValueError("clé 'nodes' absente")
+        except (ValueError, AttributeError) as e:
+            return {"status": "error", "message": f"DAG de workflow illisible : {e}"}
+        # Les nœuds sans dépendance sont exécutables immédiatement, et en parallèle entre eux
+        ready = [node for node in dag["nodes"] if not node.get("depends_on")]
+        return {
+            "status": "success",
+            "next_step": ready[0]["id"] if ready else None,
+            "inputs": ready[0].get("inputs", {}) if ready else {},
+            "parallel_with": [node["id"] for node in ready[1:]],
+            "dag": dag,
+        }
 
     def verify_system_compliance(self, system_status_report):
         """
@@ -13,42 +96,49 @@ class GeminiComplianceAgent:
         Args:
             system_status_report (str): Un rapport détaillé sur l'état actuel du système (logs, métriques, etc.).
         Returns:
-            dict: Un dictionnaire contenant l'évaluation de conformité et les recommandations.
+            dict: {"status": "success", "evaluation": {"status", "issues", "recommendations"}} ou un dictionnaire d'erreur.
         """
-        prompt = f"""
-        En tant qu'expert en conformité des systèmes IA, analysez le rapport de statut du système suivant :
-        {system_status_report}
+        prompt = self._system_compliance_prompt(system_status_report)
+        try:
+            return self._parse_evaluation(self._generate(prompt))
+        except Exception as e:
+            return {"status": "error", "message": f"Erreur lors de la vérification de conformité du système : {e}"}
 
-        Identifiez les éventuels problèmes de conformité, les incohérences ou les risques potentiels.
-        Fournissez une évaluation globale de la conformité du système et des recommandations spécifiques pour améliorer sa robustesse et sa fiabilité.
+    async def averify_system_compliance(self, system_status_report):
         """
+        Variante asynchrone de verify_system_compliance.
+        """
+        prompt = self._system_compliance_prompt(system_status_report)
         try:
-            response = self.model.generate_content(prompt)
-            return {"status": "success", "evaluation": response.text}
+            return self._parse_evaluation(await self._agenerate(prompt))
         except Exception as e:
             return {"status": "error", "message": f"Erreur lors de la vérification de conformité du système : {e}"}
 
-    def orchestrate_workflow(self, workflow_description, current_state):
+    def orchestrate_workflow(self, workflow_description, current_state, actions=None):
         """
         Orchestre un workflow complexe en fonction de sa description et de l'état actuel.
         Args:
             workflow_description (str): Description détaillée du workflow à orchestrer.
             current_state (str): L'état actuel du workflow.
+            actions (list, optional): Les noms des actions exécutables (voir workflows.dag_scheduler.agent_handlers).
+                Si None, le prompt ne restreint pas les actions (le DAG n'est alors pas forcément exécutable par run_dag).
         Returns:
-            dict: Un dictionnaire contenant les prochaines étapes suggérées.
+            dict: {"status": "success", "next_step", "inputs", "parallel_with", "dag": {"nodes": [...]}},
+                le DAG étant exécutable par workflows.dag_scheduler.run_dag.
         """
-        prompt = f"""
-        En tant qu'orchestrateur de workflow IA, analysez la description du workflow suivante :
-        {workflow_description}
-
-        L'état actuel du workflow est :
-        {current_state}
+        prompt = self._orchestration_prompt(workflow_description, current_state, actions)
+        try:
+            return self._parse_dag(self._generate(prompt))
+        except Exception as e:
+            return {"status": "error", "message": f"Erreur lors de l'orchestration du workflow : {e}"}
 
-        Déterminez la prochaine étape logique à exécuter, en tenant compte des dépendances et des conditions.
+    async def aorchestrate_workflow(self, workflow_description, current_state, actions=None):
+        """
+        Variante asynchrone de orchestrate_workflow.
         """
+        prompt = self._orchestration_prompt(workflow_description, current_state, actions)
         try:
-            response = self.model.generate_content(prompt)
-            return {"status": "success", "next_steps": response.text}
+            return self._parse_dag(await self._agenerate(prompt))
         except Exception as e:
             return {"status": "error", "message": f"Erreur lors de l'orchestration du workflow : {e}"}
 
@@ -66,6 +156,7 @@ if __name__ == "__main__":
     # Test d'orchestration de workflow
     workflow_desc = "Workflow de préparation hebdomadaire: 1. Lecture planning, 2. Analyse profils élèves, 3. Génération contenu."
     current_state_desc = "Étape 1 (Lecture planning) terminée avec succès."
-    orchestration_result = agent.orchestrate_workflow(workflow_desc, current_state_desc)
+    actions_example = ["check_compliance", "generate_worksheet", "generate_remediation_plan"]
+    orchestration_result = agent.orchestrate_workflow(workflow_desc, current_state_desc, actions_example)
     print("\n--- Orchestration de Workflow ---")
     print(orchestration_result)
@@ -1,11 +1,105 @@
+import asyncio
 import os
-from openai import OpenAI
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from tools.batch_runner import BatchQueue  # noqa: E402
+from tools.clients import get_async_openai, get_openai  # noqa: E402
+from tools.completions import (  # noqa: E402
+    DYNAMIC_SEPARATOR,
+    END_SENTINEL,
+    acomplete,
+    acomplete_stream,
+    astream_chunks,
+    complete,
+    complete_stream,
+    cut_at_stops_result,
+    parse_json_result,
+    run_many,
+    stream_chunks,
+)
+from tools.models import MAX_TOKENS, MODEL_TIERS, pick_model  # noqa: E402
 
 class OpenAIContentGenerator:
-    def __init__(self):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    def __init__(self, models=None):
+        self.client = get_openai()
+        self.aclient = get_async_openai()
+        # Modèle par niveau de criticité, surchargeable niveau par niveau
+        self.models = {**MODEL_TIERS, **(models or {})}
+        # Requêtes différées vers l'API Batch (générations hebdomadaires non interactives)
+        self.batch_queue = BatchQueue(self.client)
+
+    def _worksheet_request(self, subject, topic, student_level, num_questions, complexity=None):
+        prompt = f"""Créez une feuille d'exercices selon les paramètres indiqués après le séparateur.
+Le niveau de difficulté doit être adapté au niveau de l'élève indiqué.
+Incluez les solutions à la fin de la feuille.
+Numérotez les exercices "Question 1", "Question 2", etc. et terminez la feuille par une ligne contenant uniquement {END_SENTINEL}.
+
+{DYNAMIC_SEPARATOR}
+Matière: {subject}
+Sujet: {topic}
+Niveau de l'élève: {student_level}
+Nombre de questions: {num_questions}"""
+        return {
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "Vous êtes un générateur de contenu pédagogique expert.",
+                },
+                {
+                    "role": "user",
+                    "content": prompt,
+                }
+            ],
+            "model": pick_model(prompt, self.models, "content", complexity),
+            "temperature": 0,
+            "max_tokens": MAX_TOKENS["content"],
+        }
+
+    def _quiz_request(self, subject, topic, num_questions, quiz_type, complexity=None):
+        prompt = f"""
+        Créez un {quiz_type} de {num_questions} questions sur le sujet suivant : {topic} en {subject}.
+        Incluez les bonnes réponses.
+        Répondez uniquement par un objet JSON de la forme {{"questions": [{{"q": "<question>", "choices": ["<choix>", ...], "answer": "<bonne réponse>"}}, ...]}}.
+        """
+        return {
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "Vous êtes un créateur de quiz pédagogiques.",
+                },
+                {
+                    "role": "user",
+                    "content": prompt,
+                }
+            ],
+            "model": pick_model(prompt, self.models, "content", complexity),
+            "temperature": 0,
+            "max_tokens": MAX_TOKENS["content"],
+            "response_format": {"type": "json_object"},
+        }
+
+    def _lesson_summary_request(self, subject, topic, length, complexity=None):
+        prompt = f"""
+        Générez un résumé {length} de la leçon sur le sujet suivant : {topic} en {subject}.
+        """
+        return {
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "Vous êtes un rédacteur de résumés pédagogiques.",
+                },
+                {
+                    "role": "user",
+                    "content": prompt,
+                }
+            ],
+            "model": pick_model(prompt, self.models, "content", complexity),
+            "temperature": 0,
+            "max_tokens": MAX_TOKENS["content"],
+        }
 
-    def generate_worksheet(self, subject, topic, student_level="moyen", num_questions=5):
+    def generate_worksheet(self, subject, topic, student_level="moyen", num_questions=5, complexity=None):
         """
         Génère une feuille d'exercices pour un sujet donné.
         Args:
@@ -13,34 +107,53 @@ class OpenAIContentGenerator:
             topic (str): Le sujet spécifique (ex: "Théorème de Pythagore").
             student_level (str): Le niveau de l'élève (ex: "débutant", "moyen", "avancé").
             num_questions (int): Le nombre de questions à générer.
+            complexity (str, optional): "high" pour escalader vers le modèle le plus capable, "low" pour le modèle économique.
         Returns:
             dict: Un dictionnaire contenant la feuille d'exercices.
         """
-        prompt = f"""
-        Créez une feuille d'exercices de {num_questions} questions sur le sujet suivant : {topic} en {subject}.
-        Le niveau de difficulté doit être adapté à un élève de niveau {student_level}.
-        Incluez les solutions à la fin de la feuille.
-        """
-        try:
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Vous êtes un générateur de contenu pédagogique expert.",
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    }
-                ],
-                model="gpt-4",
-            )
-            response = chat_completion.choices[0].message.content
-            return {"status": "success", "worksheet": response}
-        except Exception as e:
-            return {"status": "error", "message": f"Erreur lors de la génération de la feuille d'exercices : {e}"}
-
-    def generate_quiz(self, subject, topic, num_questions=3, quiz_type="QCM"):
+        request = self._worksheet_request(subject, topic, student_level, num_questions, complexity)
+        return complete_stream(
+            self.client, request, "worksheet", "la génération de la feuille d'exercices"
+        )
+
+    async def agenerate_worksheet(self, subject, topic, student_level="moyen", num_questions=5, complexity=None):
+        """
+        Variante asynchrone de generate_worksheet.
+        """
+        request = self._worksheet_request(subject, topic, student_level, num_questions, complexity)
+        return await acomplete_stream(
+            self.aclient, request, "worksheet", "la génération de la feuille d'exercices"
+        )
+
+    def generate_worksheet_stream(self, subject, topic, student_level="moyen", num_questions=5, complexity=None):
+        """
+        Génère une feuille d'exercices en la renvoyant au fil de l'eau.
+        Les erreurs de l'API sont propagées (pas de dictionnaire de statut).
+        Yields:
+            str: Les fragments de la feuille, dans l'ordre.
+        """
+        request = self._worksheet_request(subject, topic, student_level, num_questions, complexity)
+        yield from stream_chunks(self.client, request)
+
+    async def agenerate_worksheet_stream(self, subject, topic, student_level="moyen", num_questions=5, complexity=None):
+        """
+        Variante asynchrone de generate_worksheet_stream.
+        """
+        request = self._worksheet_request(subject, topic, student_level, num_questions, complexity)
+        async for text in astream_chunks(self.aclient, request):
+            yield text
+
+    def queue_worksheet(self, subject, topic, student_level="moyen", num_questions=5, complexity=None):
+        """
+        Met en file une génération de feuille d'exercices pour l'API Batch.
+        Returns:
+            str: Le custom_id permettant de retrouver la feuille dans batch_queue.collect(),
+                coupée à END_SENTINEL comme celle de generate_worksheet.
+        """
+        request = self._worksheet_request(subject, topic, student_level, num_questions, complexity)
+        return self.batch_queue.add(request, "worksheet", cut_at_stops_result)
+
+    def generate_quiz(self, subject, topic, num_questions=3, quiz_type="QCM", complexity=None):
         """
         Génère un quiz sur un sujet donné.
         Args:
@@ -48,63 +161,59 @@ class OpenAIContentGenerator:
             topic (str): Le sujet spécifique.
             num_questions (int): Le nombre de questions.
             quiz_type (str): Le type de quiz (ex: "QCM", "Vrai/Faux").
+            complexity (str, optional): "high" pour escalader vers le modèle le plus capable, "low" pour le modèle économique.
         Returns:
-            dict: Un dictionnaire contenant le quiz.
+            dict: {"status": "success", "quiz": {"questions": [{"q", "choices", "answer"}, ...]}} ou un dictionnaire d'erreur.
         """
-        prompt = f"""
-        Créez un {quiz_type} de {num_questions} questions sur le sujet suivant : {topic} en {subject}.
-        Incluez les bonnes réponses.
+        request = self._quiz_request(subject, topic, num_questions, quiz_type, complexity)
+        return parse_json_result(complete(self.client, request, "quiz", "la génération du quiz"), "quiz")
+
+    async def agenerate_quiz(self, subject, topic, num_questions=3, quiz_type="QCM", complexity=None):
+        """
+        Variante asynchrone de generate_quiz.
+        """
+        request = self._quiz_request(subject, topic, num_questions, quiz_type, complexity)
+        return parse_json_result(await acomplete(self.aclient, request, "quiz", "la génération du quiz"), "quiz")
+
+    def queue_quiz(self, subject, topic, num_questions=3, quiz_type="QCM", complexity=None):
+        """
+        Met en file une génération de quiz pour l'API Batch.
+        Returns:
+            str: Le custom_id permettant de retrouver le quiz dans batch_queue.collect(),
+                décodé comme celui de generate_quiz.
         """
-        try:
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Vous êtes un créateur de quiz pédagogiques.",
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    }
-                ],
-                model="gpt-4",
-            )
-            response = chat_completion.choices[0].message.content
-            return {"status": "success", "quiz": response}
-        except Exception as e:
-            return {"status": "error", "message": f"Erreur lors de la génération du quiz : {e}"}
-
-    def generate_lesson_summary(self, subject, topic, length="court"):
+        request = self._quiz_request(subject, topic, num_questions, quiz_type, complexity)
+        return self.batch_queue.add(request, "quiz", parse_json_result)
+
+    def generate_lesson_summary(self, subject, topic, length="court", complexity=None):
         """
         Génère un résumé de leçon.
         Args:
             subject (str): La matière.
             topic (str): Le sujet spécifique.
             length (str): La longueur du résumé (ex: "court", "détaillé").
+            complexity (str, optional): "high" pour escalader vers le modèle le plus capable, "low" pour le modèle économique.
         Returns:
             dict: Un dictionnaire contenant le résumé.
         """
-        prompt = f"""
-        Générez un résumé {length} de la leçon sur le sujet suivant : {topic} en {subject}.
+        request = self._lesson_summary_request(subject, topic, length, complexity)
+        return complete(self.client, request, "summary", "la génération du résumé")
+
+    async def agenerate_lesson_summary(self, subject, topic, length="court", complexity=None):
+        """
+        Variante asynchrone de generate_lesson_summary.
+        """
+        request = self._lesson_summary_request(subject, topic, length, complexity)
+        return await acomplete(self.aclient, request, "summary", "la génération du résumé")
+
+    def queue_lesson_summary(self, subject, topic, length="court", complexity=None):
+        """
+        Met en file une génération de résumé de leçon pour l'API Batch.
+        Returns:
+            str: Le custom_id permettant de retrouver le résumé dans batch_queue.collect().
         """
-        try:
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Vous êtes un rédacteur de résumés pédagogiques.",
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    }
-                ],
-                model="gpt-4",
-            )
-            response = chat_completion.choices[0].message.content
-            return {"status": "success", "summary": response}
-        except Exception as e:
-            return {"status": "error", "message": f"Erreur lors de la génération du résumé : {e}"}
+        request = self._lesson_summary_request(subject, topic, length, complexity)
+        return self.batch_queue.add(request, "summary")
 
 if __name__ == "__main__":
     # Exemple d'utilisation (pour les tests locaux)
@@ -115,6 +224,12 @@ if __name__ == "__main__":
     print("\n--- Feuille d'exercices ---")
     print(worksheet_result)
 
+    # Test de génération en streaming : la feuille s'affiche au fil de la génération
+    print("\n--- Feuille d'exercices (streaming) ---")
+    for fragment in agent.generate_worksheet_stream("Mathématiques", "Les fractions", num_questions=3):
+        print(fragment, end="", flush=True)
+    print()
+
     # Test de génération de quiz
     quiz_result = agent.generate_quiz("Physique", "L'électricité", quiz_type="Vrai/Faux")
     print("\n--- Quiz ---")
@@ -124,3 +239,15 @@ if __name__ == "__main__":
     summary_result = agent.generate_lesson_summary("Informatique", "Création d'adresse mail", "détaillé")
     print("\n--- Résumé de leçon ---")
     print(summary_result)
+
+    # Test de génération concurrente de feuilles d'exercices
+    topics = ["Les fractions", "Les pourcentages", "Le théorème de Thalès"]
+    worksheets = asyncio.run(run_many(agent.agenerate_worksheet("Mathématiques", t) for t in topics))
+    print("\n--- Feuilles d'exercices concurrentes ---")
+    print(worksheets)
+
+    # Test de génération différée via l'API Batch (réponse sous 24h)
+    ids = [agent.queue_worksheet("Mathématiques", t) for t in topics]
+    batch_id = agent.batch_queue.flush()
+    print(f"\n--- Batch soumis: {batch_id} ---")
+    print(agent.batch_queue.collect(batch_id))
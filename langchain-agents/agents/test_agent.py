@@ -1,22 +1,38 @@
 import os
-from openai import OpenAI
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from tools.clients import get_async_openai, get_openai  # noqa: E402
+from tools.models import MAX_TOKENS, MODEL_TIERS  # noqa: E402
+
+TEST_REQUEST = {
+    "messages": [
+        {
+            "role": "user",
+            "content": "Dis bonjour en français.",
+        }
+    ],
+    "model": MODEL_TIERS["test"],
+    "temperature": 0,
+    "max_tokens": MAX_TOKENS["test"],
+}
 
 class TestAgent:
     def __init__(self):
-        # Récupérer la clé API depuis les variables d'environnement
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        # Clients partagés, construits depuis OPENAI_API_KEY
+        self.client = get_openai()
+        self.aclient = get_async_openai()
 
     def test_connection(self):
         try:
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "user",
-                        "content": "Dis bonjour en français.",
-                    }
-                ],
-                model="gpt-3.5-turbo",
-            )
+            chat_completion = self.client.chat.completions.create(**TEST_REQUEST)
+            return chat_completion.choices[0].message.content
+        except Exception as e:
+            return f"Erreur de connexion à OpenAI : {e}"
+
+    async def atest_connection(self):
+        try:
+            chat_completion = await self.aclient.chat.completions.create(**TEST_REQUEST)
             return chat_completion.choices[0].message.content
         except Exception as e:
             return f"Erreur de connexion à OpenAI : {e}"
@@ -0,0 +1,267 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import aiohttp
+from google.auth.transport.requests import Request
+from tenacity import retry, stop_after_attempt, wait_exponential, wait_random
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from tools.auth import USER_AGENT, get_credentials  # noqa: E402
+from tools.gmail_manager import GMAIL_SCOPES, _message_body  # noqa: E402
+from tools.google_api import (  # noqa: E402
+    BASE_BACKOFF_SECONDS,
+    IDEMPOTENT_METHODS,
+    MAX_ATTEMPTS,
+    MAX_BACKOFF_SECONDS,
+    MAX_JITTER_SECONDS,
+    RATE_LIMIT_REASONS,
+    RETRYABLE_STATUSES,
+    api_method,
+)
+from tools.google_classroom_manager import CLASSROOM_SCOPES, _announcement_body, _coursework_body  # noqa: E402
+
+# Connexions simultanées par session (toutes hôtes confondus) : borne aussi la concurrence des gather()
+CONNECTION_LIMIT = 32
+REQUEST_TIMEOUT_SECONDS = 60
+# Les jetons d'accès du compte de service expirent après une heure : on les renouvelle avant
+TOKEN_REFRESH_SECONDS = 50 * 60
+
+GMAIL_SEND_URL = "https://gmail.googleapis.com/gmail/v1/users/me/messages/send"
+CLASSROOM_COURSES_URL = "https://classroom.googleapis.com/v1/courses"
+
+# En-tête Authorization par jeu de scopes, partagé par toutes les sessions du processus : (en-tête, instant d'obtention)
+_auth_headers = {}
+_auth_lock = threading.Lock()
+
+
+def _refresh_auth_header(scopes):
+    # Appelé dans un thread (creds.refresh est bloquant) ; le verrou évite des rafraîchissements concurrents
+    with _auth_lock:
+        header, fetched_at = _auth_headers.get(scopes, (None, 0.0))
+        if header is None or time.monotonic() - fetched_at >= TOKEN_REFRESH_SECONDS:
+            creds = get_credentials(scopes)
+            creds.refresh(Request())
+            header = {"Authorization": f"Bearer {creds.token}"}
+            _auth_headers[scopes] = (header, time.monotonic())
+        return header
+
+
+async def _auth_header(scopes):
+    header, fetched_at = _auth_headers.get(scopes, (None, 0.0))
+    if header is not None and time.monotonic() - fetched_at < TOKEN_REFRESH_SECONDS:
+        return header
+    return await asyncio.to_thread(_refresh_auth_header, scopes)
+
+
+def _is_rate_limited(error):
+    if not isinstance(error, aiohttp.ClientResponseError):
+        return False
+    return error.status == 429 or (error.status == 403 and any(reason in error.message for reason in RATE_LIMIT_REASONS))
+
+
+def _is_transient(error):
+    if isinstance(error, (aiohttp.ClientConnectionError, asyncio.TimeoutError)) or _is_rate_limited(error):
+        return True
+    return isinstance(error, aiohttp.ClientResponseError) and error.status in RETRYABLE_STATUSES
+
+
+def _should_retry(retry_state):
+    # Comme google_api.execute : une requête non idempotente n'est rejouée que si le serveur ne l'a pas traitée
+    # (refus pour quota, ou connexion impossible à établir)
+    if not retry_state.outcome.failed:
+        return False
+    error = retry_state.outcome.exception()
+    method = retry_state.args[1] if len(retry_state.args) > 1 else retry_state.kwargs["method"]
+    if method in IDEMPOTENT_METHODS:
+        return _is_transient(error)
+    return _is_rate_limited(error) or isinstance(error, aiohttp.ClientConnectorError)
+
+
+# Même politique de reprise que google_api.execute, appliquée aux erreurs aiohttp
+_retry = retry(
+    retry=_should_retry,
+    wait=wait_exponential(multiplier=BASE_BACKOFF_SECONDS, max=MAX_BACKOFF_SECONDS) + wait_random(0, MAX_JITTER_SECONDS),
+    stop=stop_after_attempt(MAX_ATTEMPTS),
+    reraise=True,
+)
+
+
+def _statuses(results, result_key):
+    # Résultats de gather(return_exceptions=True) -> dictionnaires de statut, comme les envois par lots
+    # (les erreurs sont des ApiError, dont le message porte déjà le libellé de l'opération)
+    return [
+        {"status": "error", "message": str(result)} if isinstance(result, Exception) else {"status": "success", result_key: result}
+        for result in results
+    ]
+
+
+class _AsyncGoogleManager:
+    """
+    Base des managers asynchrones : appels REST directs aux API Google via une session aiohttp
+    (pool de CONNECTION_LIMIT connexions keep-alive), avec les credentials partagés de tools.auth.
+    La session est liée à la boucle d'événements qui l'a créée : fermer le manager (close() ou async with)
+    avant la fin de cette boucle.
+    """
+
+    SCOPES = ()
+
+    def __init__(self):
+        self._session = None
+
+    @property
+    def session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=CONNECTION_LIMIT),
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT_SECONDS),
+                headers={"User-Agent": USER_AGENT},
+            )
+        return self._session
+
+    async def close(self):
+        """
+        Ferme la session aiohttp et ses connexions.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    @_retry
+    async def _request(self, method, url, body=None):
+        headers = await _auth_header(self.SCOPES)
+        async with self.session.request(method, url, json=body, headers=headers) as response:
+            if response.status >= 400:
+                # Le corps de l'erreur (raison Google) remplace le simple libellé HTTP
+                raise aiohttp.ClientResponseError(
+                    response.request_info,
+                    response.history,
+                    status=response.status,
+                    message=await response.text(),
+                    headers=response.headers,
+                )
+            return await response.json()
+
+
+class AsyncGmailManager(_AsyncGoogleManager):
+    SCOPES = GMAIL_SCOPES
+
+    @api_method("l'envoi de l'email")
+    async def send_email(self, to, subject, message_text):
+        """
+        Variante asynchrone de GmailManager.send_email.
+        Args:
+            to (str): L'adresse email du destinataire.
+            subject (str): Le sujet de l'email.
+            message_text (str): Le corps du message.
+        Returns:
+            dict: {"message_id": ...}.
+        Raises:
+            ApiError: Si l'envoi échoue.
+        """
+        response = await self._request("POST", GMAIL_SEND_URL, _message_body(to, subject, message_text))
+        return {"message_id": response["id"]}
+
+    async def send_emails(self, messages):
+        """
+        Envoie plusieurs emails en parallèle (au plus CONNECTION_LIMIT requêtes simultanées).
+        Args:
+            messages (list): Des tuples (to, subject, message_text).
+        Returns:
+            list: Dans l'ordre des messages, {"status": "success", "message_id": ...}
+                ou {"status": "error", "message": ...}.
+        """
+        results = await asyncio.gather(*(self.send_email(*message) for message in messages), return_exceptions=True)
+        return [
+            {"status": "error", "message": str(result)} if isinstance(result, Exception) else {"status": "success", **result}
+            for result in results
+        ]
+
+
+class AsyncGoogleClassroomManager(_AsyncGoogleManager):
+    SCOPES = CLASSROOM_SCOPES
+
+    @api_method("la création de l'annonce")
+    async def create_announcement(self, course_id, text):
+        """
+        Variante asynchrone de GoogleClassroomManager.create_announcement.
+        Args:
+            course_id (str): L'ID du cours.
+            text (str): Le texte de l'annonce.
+        Returns:
+            dict: Les métadonnées de l'annonce créée.
+        Raises:
+            ApiError: Si la création échoue.
+        """
+        url = f"{CLASSROOM_COURSES_URL}/{course_id}/announcements"
+        return await self._request("POST", url, _announcement_body(text))
+
+    @api_method("la création du devoir")
+    async def create_coursework(self, course_id, title, description, materials=None):
+        """
+        Variante asynchrone de GoogleClassroomManager.create_coursework.
+        Args:
+            course_id (str): L'ID du cours.
+            title (str): Le titre du devoir.
+            description (str): La description du devoir.
+            materials (list): Liste d'objets material (ex: {'link': {'url': '...'}}).
+        Returns:
+            dict: Les métadonnées du devoir créé.
+        Raises:
+            ApiError: Si la création échoue.
+        """
+        url = f"{CLASSROOM_COURSES_URL}/{course_id}/courseWork"
+        return await self._request("POST", url, _coursework_body(title, description, materials))
+
+    async def create_announcements(self, items):
+        """
+        Publie plusieurs annonces en parallèle (au plus CONNECTION_LIMIT requêtes simultanées).
+        Args:
+            items (list): Des tuples (course_id, text).
+        Returns:
+            list: Dans l'ordre des éléments, {"status": "success", "announcement": ...}
+                ou {"status": "error", "message": ...}.
+        """
+        results = await asyncio.gather(*(self.create_announcement(*item) for item in items), return_exceptions=True)
+        return _statuses(results, "announcement")
+
+    async def create_courseworks(self, items):
+        """
+        Crée plusieurs devoirs en parallèle (au plus CONNECTION_LIMIT requêtes simultanées).
+        Args:
+            items (list): Des tuples (course_id, title, description) ou (course_id, title, description, materials).
+        Returns:
+            list: Dans l'ordre des éléments, {"status": "success", "coursework": ...}
+                ou {"status": "error", "message": ...}.
+        """
+        results = await asyncio.gather(*(self.create_coursework(*item) for item in items), return_exceptions=True)
+        return _statuses(results, "coursework")
+
+
+if __name__ == "__main__":
+    # Exemple d'utilisation (pour les tests locaux)
+    # Assurez-vous que GOOGLE_CREDENTIALS est défini dans votre environnement ou .env
+    # et que vous avez activé Google Classroom API dans votre projet GCP.
+
+    # Remplacez par des IDs de cours valides pour les tests
+    test_course_ids = ["YOUR_COURSE_ID_HERE"]
+
+    async def main():
+        async with AsyncGoogleClassroomManager() as classroom_manager:
+            return await classroom_manager.create_announcements(
+                [(course_id, "Bonjour la classe ! Nouvelle annonce de l'IA.") for course_id in test_course_ids]
+            )
+
+    if test_course_ids != ["YOUR_COURSE_ID_HERE"]:
+        print("\n--- Création des annonces ---")
+        print(asyncio.run(main()))
+    else:
+        print("Veuillez remplacer YOUR_COURSE_ID_HERE par des IDs de cours valides pour tester la création d'annonces.")
@@ -0,0 +1,175 @@
+import functools
+import hashlib
+import os
+import threading
+import time
+
+from google.oauth2 import service_account
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build
+from googleapiclient.discovery_cache.base import Cache
+from googleapiclient.errors import UnknownApiNameOrVersion
+from googleapiclient.http import build_http, set_user_agent
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:  # orjson absent : json de la bibliothèque standard, plus lent mais équivalent
+    from json import loads as _json_loads
+
+# Le suffixe "(gzip)" est requis par les API Google pour compresser les réponses
+# (httplib2 envoie déjà Accept-Encoding: gzip, deflate)
+USER_AGENT = "mfr-education-automation (gzip)"
+# Documents de découverte téléchargés pour les API absentes de la version installée de googleapiclient
+DISCOVERY_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "mfr", "discovery")
+DISCOVERY_CACHE_MAX_AGE_SECONDS = 24 * 60 * 60
+
+
+@functools.lru_cache(maxsize=1)
+def _parse_credentials(creds_json):
+    # Clé de cache = le contenu de la variable : une valeur modifiée est reparsée
+    return _json_loads(creds_json)
+
+
+def _creds_info():
+    creds_json = os.getenv("GOOGLE_CREDENTIALS")
+    if not creds_json:
+        raise ValueError("GOOGLE_CREDENTIALS environment variable not set.")
+    return _parse_credentials(creds_json)
+
+
+@functools.lru_cache(maxsize=None)
+def get_credentials(scopes):
+    """
+    Renvoie les credentials du compte de service pour un jeu de scopes, partagés dans le processus.
+    Args:
+        scopes (tuple): Les scopes OAuth (tuple pour être hachable).
+    Returns:
+        service_account.Credentials: Les credentials (rafraîchis automatiquement par le client).
+    """
+    return service_account.Credentials.from_service_account_info(_creds_info(), scopes=list(scopes))
+
+
+def new_transport():
+    """
+    Crée un transport httplib2 (timeout par défaut de googleapiclient, 308 non suivis pour les uploads
+    reprenables, user-agent gzip). Ses connexions TLS restent ouvertes d'un appel à l'autre.
+    httplib2.Http n'étant pas thread-safe, chaque thread doit utiliser le sien.
+    Returns:
+        httplib2.Http: Le transport.
+    """
+    return set_user_agent(build_http(), USER_AGENT)
+
+
+@functools.lru_cache(maxsize=1)
+def _shared_transport():
+    return new_transport()
+
+
+@functools.lru_cache(maxsize=None)
+def _shared_authorized_http(scopes):
+    return AuthorizedHttp(get_credentials(scopes), http=_shared_transport())
+
+
+_thread_local = threading.local()
+
+
+def get_thread_http(scopes):
+    """
+    Renvoie le client HTTP authentifié du thread courant pour un jeu de scopes, avec son propre transport
+    (httplib2 n'est pas thread-safe). Ses connexions keep-alive sont réutilisées d'un appel à l'autre du thread.
+    Args:
+        scopes (tuple): Les scopes OAuth.
+    Returns:
+        AuthorizedHttp: Le client HTTP authentifié du thread.
+    """
+    clients = _thread_local.__dict__.setdefault("clients", {})
+    if scopes not in clients:
+        clients[scopes] = AuthorizedHttp(get_credentials(scopes), http=new_transport())
+    return clients[scopes]
+
+
+def get_authorized_http(scopes, shared=False):
+    """
+    Renvoie le client HTTP authentifié d'un jeu de scopes : celui du thread courant par défaut.
+    Args:
+        scopes (tuple): Les scopes OAuth.
+        shared (bool): True pour un client unique dans le processus, sur un transport partagé par tous
+            les jeux de scopes. À réserver aux programmes mono-thread : httplib2.Http n'est pas thread-safe.
+    Returns:
+        AuthorizedHttp: Le client HTTP authentifié.
+    """
+    if shared:
+        return _shared_authorized_http(scopes)
+    return get_thread_http(scopes)
+
+
+class DiscoveryFileCache(Cache):
+    """
+    Cache sur disque des documents de découverte (un fichier JSON par URL), partagé entre les processus.
+    Une erreur d'écriture ou de lecture désactive simplement le cache : build() retélécharge le document.
+    """
+
+    def __init__(self, directory=DISCOVERY_CACHE_DIR, max_age=DISCOVERY_CACHE_MAX_AGE_SECONDS):
+        self.directory = directory
+        self.max_age = max_age
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, url):
+        path = self._path(url)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age:
+                return None
+            with open(path, "r", encoding="utf-8") as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def set(self, url, content):
+        # Écriture atomique, comme les fichiers compagnons de yaml_cache
+        path = self._path(url)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                file.write(content if isinstance(content, str) else content.decode("utf-8"))
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def _build_service(api, version, http):
+    try:
+        return build(api, version, http=http, static_discovery=True, cache_discovery=False)
+    except UnknownApiNameOrVersion:
+        return build(api, version, http=http, static_discovery=False, cache=DiscoveryFileCache())
+
+
+@functools.lru_cache(maxsize=None)
+def _shared_service(api, version, scopes):
+    return _build_service(api, version, get_authorized_http(scopes, shared=True))
+
+
+def get_service(api, version, scopes, shared=False):
+    """
+    Renvoie le service googleapiclient d'une API, construit une seule fois par thread
+    (chaque thread exécute ses requêtes sur son propre client HTTP, voir get_thread_http).
+    Le document de découverte est celui embarqué dans googleapiclient (aucun appel réseau) ;
+    pour une API qui n'y figure pas, il est téléchargé puis conservé dans DISCOVERY_CACHE_DIR.
+    Args:
+        api (str): Le nom de l'API (ex: "gmail").
+        version (str): La version de l'API (ex: "v1").
+        scopes (tuple): Les scopes OAuth.
+        shared (bool): True pour un service unique dans le processus (voir get_authorized_http).
+    Returns:
+        googleapiclient.discovery.Resource: Le service.
+    """
+    if shared:
+        return _shared_service(api, version, scopes)
+    services = _thread_local.__dict__.setdefault("services", {})
+    key = (api, version, scopes)
+    if key not in services:
+        services[key] = _build_service(api, version, get_thread_http(scopes))
+    return services[key]
@@ -0,0 +1,149 @@
+import json
+import os
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from tools.clients import get_openai  # noqa: E402
+from tools.models import MAX_TOKENS, MODEL_TIERS  # noqa: E402
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def submit_batch(requests, client=None):
+    """
+    Soumet un lot de requêtes à l'API Batch d'OpenAI (50% moins cher, délai < 24h).
+    Args:
+        requests (list): Des lignes {"custom_id", "method", "url", "body"} au format JSONL Batch.
+        client (OpenAI, optional): Le client à utiliser. Si None, le client partagé est utilisé.
+    Returns:
+        str: L'ID du batch créé.
+    """
+    client = client or get_openai()
+    jsonl = "\n".join(json.dumps(request, ensure_ascii=False) for request in requests)
+    batch_file = client.files.create(file=("batch.jsonl", jsonl.encode("utf-8")), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window=COMPLETION_WINDOW,
+    )
+    return batch.id
+
+
+def collect_batch(batch_id, client=None, poll_interval=60):
+    """
+    Attend la fin d'un batch puis télécharge et indexe ses résultats.
+    Args:
+        batch_id (str): L'ID du batch renvoyé par submit_batch.
+        client (OpenAI, optional): Le client à utiliser.
+        poll_interval (int): Le délai en secondes entre deux interrogations du statut.
+    Returns:
+        dict: Les réponses indexées par custom_id ({"status_code", "body"} ou {"error"}).
+    """
+    client = client or get_openai()
+    batch = client.batches.retrieve(batch_id)
+    while batch.status not in TERMINAL_STATUSES:
+        time.sleep(poll_interval)
+        batch = client.batches.retrieve(batch_id)
+
+    if batch.status != "completed":
+        raise RuntimeError(f"Le batch {batch_id} s'est terminé avec le statut '{batch.status}'.")
+
+    results = {}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        for line in client.files.content(file_id).text.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if item.get("error"):
+                results[item["custom_id"]] = {"error": item["error"]}
+            else:
+                results[item["custom_id"]] = item["response"]
+    return results
+
+
+class BatchQueue:
+    """
+    Tampon de requêtes chat.completions destinées à l'API Batch.
+    Les agents y ajoutent leurs requêtes (queue_*), un driver de workflow appelle flush() puis collect().
+    """
+
+    def __init__(self, client=None):
+        self.client = client
+        self._buffer = []
+        self._result_keys = {}
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def add(self, request, result_key, parse=None):
+        """
+        Ajoute une requête au tampon.
+        Args:
+            request (dict): Les paramètres de chat.completions.create (model, messages, ...).
+            result_key (str): La clé sous laquelle renvoyer le contenu généré (ex: "worksheet").
+            parse (callable, optional): Post-traitement appliqué par collect() au résultat, appelé comme
+                parse(result, result_key) (ex: completions.parse_json_result), pour rendre la même forme
+                que la méthode synchrone correspondante.
+        Returns:
+            str: Le custom_id permettant de retrouver la réponse.
+        """
+        custom_id = f"{result_key}-{uuid.uuid4().hex}"
+        self._buffer.append({"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": request})
+        self._result_keys[custom_id] = (result_key, parse)
+        return custom_id
+
+    def flush(self):
+        """
+        Soumet le contenu du tampon en un seul batch et le vide.
+        Returns:
+            str: L'ID du batch, ou None si le tampon était vide.
+        """
+        if not self._buffer:
+            return None
+        batch_id = submit_batch(self._buffer, self.client)
+        self._buffer = []
+        return batch_id
+
+    def collect(self, batch_id, poll_interval=60):
+        """
+        Récupère les résultats d'un batch au format renvoyé par les méthodes generate_*.
+        Args:
+            batch_id (str): L'ID du batch renvoyé par flush().
+            poll_interval (int): Le délai en secondes entre deux interrogations du statut.
+        Returns:
+            dict: {custom_id: {"status": "success", result_key: ...} ou {"status": "error", "message": ...}}.
+        """
+        results = {}
+        for custom_id, response in collect_batch(batch_id, self.client, poll_interval).items():
+            result_key, parse = self._result_keys.pop(custom_id, ("response", None))
+            body = response.get("body") or {}
+            if response.get("error") or response.get("status_code") != 200:
+                error = response.get("error") or body.get("error")
+                results[custom_id] = {"status": "error", "message": f"Erreur lors du traitement batch : {error}"}
+            else:
+                results[custom_id] = {"status": "success", result_key: body["choices"][0]["message"]["content"]}
+            if parse is not None:
+                results[custom_id] = parse(results[custom_id], result_key)
+        return results
+
+if __name__ == "__main__":
+    # Exemple d'utilisation (pour les tests locaux)
+    # Assurez-vous que OPENAI_API_KEY est défini dans votre environnement ou .env
+    queue = BatchQueue()
+    custom_id = queue.add(
+        {
+            "model": MODEL_TIERS["test"],
+            "messages": [{"role": "user", "content": "Dis bonjour en français."}],
+            "max_tokens": MAX_TOKENS["test"],
+        },
+        "response",
+    )
+    batch_id = queue.flush()
+    print(f"Batch soumis: {batch_id} (requête {custom_id})")
+    print(queue.collect(batch_id))
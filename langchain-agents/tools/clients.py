@@ -0,0 +1,74 @@
+import functools
+import os
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+DEEPSEEK_BASE_URL = "https://api.deepseek.com/v1"
+
+# Pool de connexions partagé par tous les agents : les connexions TLS restent ouvertes
+# d'un appel à l'autre, et HTTP/2 multiplexe les requêtes concurrentes sur une seule connexion.
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+
+
+@functools.lru_cache(maxsize=None)
+def get_openai():
+    """
+    Renvoie le client OpenAI synchrone partagé du processus.
+    """
+    return OpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        http_client=httpx.Client(limits=HTTP_LIMITS, http2=True),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_async_openai():
+    """
+    Renvoie le client OpenAI asynchrone partagé du processus.
+    Ses connexions sont liées à la boucle d'événements qui les a ouvertes : l'utiliser depuis une seule boucle.
+    """
+    return AsyncOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        http_client=httpx.AsyncClient(limits=HTTP_LIMITS, http2=True),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_deepseek():
+    """
+    Renvoie le client DeepSeek (API compatible OpenAI) synchrone partagé du processus.
+    """
+    return OpenAI(
+        api_key=os.getenv("DEEPSEEK_API_KEY"),
+        base_url=DEEPSEEK_BASE_URL,
+        http_client=httpx.Client(limits=HTTP_LIMITS, http2=True),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_async_deepseek():
+    """
+    Renvoie le client DeepSeek asynchrone partagé du processus.
+    """
+    return AsyncOpenAI(
+        api_key=os.getenv("DEEPSEEK_API_KEY"),
+        base_url=DEEPSEEK_BASE_URL,
+        http_client=httpx.AsyncClient(limits=HTTP_LIMITS, http2=True),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_gemini(model_name="gemini-1.5-flash"):
+    """
+    Renvoie le modèle Gemini partagé du processus (la clé API n'est configurée qu'une fois).
+    Args:
+        model_name (str): Le nom du modèle Gemini.
+    Returns:
+        genai.GenerativeModel: Le modèle configuré.
+    """
+    # Import différé : le SDK Gemini (gRPC) est lourd et inutile aux agents OpenAI/DeepSeek
+    import google.generativeai as genai
+
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    return genai.GenerativeModel(model_name)
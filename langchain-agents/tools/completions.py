@@ -0,0 +1,300 @@
+import asyncio
+import json
+
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+
+from tools.llm_cache import cached_llm_call
+from tools.models import check_context
+from tools.ratelimit import DEFAULT_RATE_LIMIT_PAUSE_SECONDS, estimate_tokens, get_bucket, retry_after_seconds
+
+# Erreurs transitoires rejouées (429, timeout, coupure réseau, 5xx) et nombre maximal de tentatives
+RETRYABLE_ERRORS = (APITimeoutError, RateLimitError, APIConnectionError, InternalServerError)
+MAX_ATTEMPTS = 5
+MAX_BACKOFF_SECONDS = 60
+# Sépare la partie statique d'un prompt (mise en cache par le fournisseur) de sa partie variable
+DYNAMIC_SEPARATOR = "---DYNAMIC---"
+# Ligne demandée au modèle en fin de réponse : le flux est coupé dès qu'elle apparaît
+END_SENTINEL = "---END---"
+
+
+def complete(client, request, result_key, error_label):
+    """
+    Exécute une requête chat.completions (mise en cache via llm_cache) et normalise le résultat.
+    Args:
+        client (OpenAI): Le client synchrone (OpenAI ou compatible, ex: DeepSeek).
+        request (dict): Les paramètres de chat.completions.create (model, messages, ...).
+        result_key (str): La clé sous laquelle renvoyer le contenu généré.
+        error_label (str): Le libellé de l'opération, repris dans le message d'erreur.
+    Returns:
+        dict: {"status": "success", result_key: ...} ou {"status": "error", "message": ...}.
+    """
+    try:
+        check_context(request)
+        response = _create(client, request)
+        return {"status": "success", result_key: response}
+    except Exception as e:
+        return {"status": "error", "message": f"Erreur lors de {error_label} : {e}"}
+
+
+async def acomplete(aclient, request, result_key, error_label):
+    """
+    Variante asynchrone de complete().
+    Args:
+        aclient (AsyncOpenAI): Le client asynchrone.
+        request (dict): Les paramètres de chat.completions.create.
+        result_key (str): La clé sous laquelle renvoyer le contenu généré.
+        error_label (str): Le libellé de l'opération, repris dans le message d'erreur.
+    Returns:
+        dict: {"status": "success", result_key: ...} ou {"status": "error", "message": ...}.
+    """
+    try:
+        check_context(request)
+        response = await _acreate(aclient, request)
+        return {"status": "success", result_key: response}
+    except Exception as e:
+        return {"status": "error", "message": f"Erreur lors de {error_label} : {e}"}
+
+
+def complete_stream(client, request, result_key, error_label, stops=(END_SENTINEL,)):
+    """
+    Comme complete(), mais la réponse est lue en streaming et la génération est interrompue
+    dès qu'un des marqueurs d'arrêt apparaît (les tokens suivants ne sont pas facturés).
+    Args:
+        client (OpenAI): Le client synchrone.
+        request (dict): Les paramètres de chat.completions.create.
+        result_key (str): La clé sous laquelle renvoyer le contenu généré.
+        error_label (str): Le libellé de l'opération, repris dans le message d'erreur.
+        stops (tuple): Les marqueurs d'arrêt, exclus du résultat.
+    Returns:
+        dict: {"status": "success", result_key: ...} ou {"status": "error", "message": ...}.
+    """
+    try:
+        check_context(request)
+        response = _create_streamed(client, {**request, "stream": True}, stops)
+        return {"status": "success", result_key: response}
+    except Exception as e:
+        return {"status": "error", "message": f"Erreur lors de {error_label} : {e}"}
+
+
+async def acomplete_stream(aclient, request, result_key, error_label, stops=(END_SENTINEL,)):
+    """
+    Variante asynchrone de complete_stream().
+    """
+    try:
+        check_context(request)
+        response = await _acreate_streamed(aclient, {**request, "stream": True}, stops)
+        return {"status": "success", result_key: response}
+    except Exception as e:
+        return {"status": "error", "message": f"Erreur lors de {error_label} : {e}"}
+
+
+def stream_chunks(client, request, stops=(END_SENTINEL,)):
+    """
+    Générateur des fragments de texte d'une réponse en streaming, arrêté (et la connexion fermée)
+    au premier marqueur d'arrêt. Les erreurs de l'API sont propagées à l'appelant.
+    Args:
+        client (OpenAI): Le client synchrone.
+        request (dict): Les paramètres de chat.completions.create.
+        stops (tuple): Les marqueurs d'arrêt, exclus du texte renvoyé.
+    Yields:
+        str: Les fragments de texte, dans l'ordre.
+    """
+    check_context(request)
+    get_bucket(request["model"]).acquire(estimate_tokens(request))
+    stream = client.chat.completions.create(**{**request, "stream": True})
+    splitter = _StopSplitter(stops)
+    try:
+        for chunk in stream:
+            text, stopped = splitter.feed(_delta(chunk))
+            if text:
+                yield text
+            if stopped:
+                return
+        if splitter.rest():
+            yield splitter.rest()
+    finally:
+        stream.close()
+
+
+async def astream_chunks(aclient, request, stops=(END_SENTINEL,)):
+    """
+    Variante asynchrone de stream_chunks().
+    """
+    check_context(request)
+    await get_bucket(request["model"]).aacquire(estimate_tokens(request))
+    stream = await aclient.chat.completions.create(**{**request, "stream": True})
+    splitter = _StopSplitter(stops)
+    try:
+        async for chunk in stream:
+            text, stopped = splitter.feed(_delta(chunk))
+            if text:
+                yield text
+            if stopped:
+                return
+        if splitter.rest():
+            yield splitter.rest()
+    finally:
+        await stream.close()
+
+
+class _StopSplitter:
+    """
+    Accumule les fragments du flux et ne libère que le texte qui ne peut plus être
+    le début d'un marqueur d'arrêt coupé entre deux fragments.
+    """
+
+    def __init__(self, stops):
+        self.stops = [stop for stop in stops if stop]
+        self.holdback = max((len(stop) for stop in self.stops), default=1) - 1
+        self.buffer = ""
+        self.emitted = 0
+
+    def feed(self, delta):
+        self.buffer += delta
+        positions = [i for i in (self.buffer.find(stop, self.emitted) for stop in self.stops) if i != -1]
+        if positions:
+            text = self.buffer[self.emitted:min(positions)]
+            self.emitted = len(self.buffer)
+            return text, True
+        safe = len(self.buffer) - self.holdback
+        if safe <= self.emitted:
+            return "", False
+        text = self.buffer[self.emitted:safe]
+        self.emitted = safe
+        return text, False
+
+    def rest(self):
+        return self.buffer[self.emitted:]
+
+
+def _delta(chunk):
+    # Le dernier fragment (usage) peut ne porter aucun choix
+    if not chunk.choices:
+        return ""
+    return chunk.choices[0].delta.content or ""
+
+
+_backoff = wait_random_exponential(min=1, max=MAX_BACKOFF_SECONDS)
+
+
+def _wait(retry_state):
+    # Sur 429, le délai Retry-After de l'API (ou une pause par défaut) suspend tout le seau du modèle,
+    # et pas seulement cet appel, comme api_request_parallel_processor : la tentative suivante attend
+    # dans acquire(). Les autres erreurs transitoires suivent un backoff exponentiel avec jitter.
+    error = retry_state.outcome.exception()
+    if isinstance(error, RateLimitError):
+        request = retry_state.args[1]
+        get_bucket(request["model"]).pause(retry_after_seconds(error) or DEFAULT_RATE_LIMIT_PAUSE_SECONDS)
+        return 0
+    return _backoff(retry_state)
+
+
+# Politique de reprise commune aux appels chat.completions (fn(client, request, ...)) ;
+# seule l'erreur de la dernière tentative remonte jusqu'au dictionnaire d'erreur de complete()
+_retry = retry(
+    retry=retry_if_exception_type(RETRYABLE_ERRORS),
+    wait=_wait,
+    stop=stop_after_attempt(MAX_ATTEMPTS),
+    reraise=True,
+)
+
+
+@cached_llm_call
+@_retry
+def _create_streamed(client, request, stops):
+    # Le flux est entièrement consommé ici : rejouer l'appel complet après une coupure est sans risque
+    return "".join(stream_chunks(client, request, stops)).rstrip()
+
+
+@cached_llm_call
+@_retry
+async def _acreate_streamed(aclient, request, stops):
+    return "".join([text async for text in astream_chunks(aclient, request, stops)]).rstrip()
+
+
+@cached_llm_call
+@_retry
+def _create(client, request):
+    get_bucket(request["model"]).acquire(estimate_tokens(request))
+    chat_completion = client.chat.completions.create(**request)
+    return chat_completion.choices[0].message.content
+
+
+@cached_llm_call
+@_retry
+async def _acreate(aclient, request):
+    # Le seau partagé régule le débit de tous les agents ; une requête limitée est remise en file
+    await get_bucket(request["model"]).aacquire(estimate_tokens(request))
+    chat_completion = await aclient.chat.completions.create(**request)
+    return chat_completion.choices[0].message.content
+
+
+def parse_json_response(text):
+    """
+    Décode une réponse JSON du modèle, en tolérant un bloc de code Markdown autour.
+    Args:
+        text (str): Le contenu renvoyé par le modèle.
+    Returns:
+        object: La valeur JSON décodée.
+    """
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0]
+    return json.loads(text)
+
+
+def parse_json_result(result, result_key):
+    """
+    Décode le contenu JSON d'un résultat de complete() sous result_key.
+    Args:
+        result (dict): Le résultat de complete() (ou d'une de ses variantes).
+        result_key (str): La clé contenant la réponse JSON du modèle.
+    Returns:
+        dict: Le même résultat avec la valeur décodée, ou un dictionnaire d'erreur si la réponse est illisible.
+    """
+    if result["status"] != "success":
+        return result
+    try:
+        return {**result, result_key: parse_json_response(result[result_key])}
+    except ValueError as e:
+        return {"status": "error", "message": f"Réponse JSON illisible : {e}"}
+
+
+def cut_at_stops_result(result, result_key, stops=(END_SENTINEL,)):
+    """
+    Coupe le contenu d'un résultat non streamé (ex: réponse de l'API Batch) au premier marqueur d'arrêt,
+    comme le fait le flux de complete_stream().
+    Args:
+        result (dict): Le résultat à normaliser.
+        result_key (str): La clé contenant le texte généré.
+        stops (tuple): Les marqueurs d'arrêt, exclus du texte.
+    Returns:
+        dict: Le même résultat, texte coupé au premier marqueur puis rstrip().
+    """
+    if result["status"] != "success":
+        return result
+    text = result[result_key]
+    positions = [i for i in (text.find(stop) for stop in stops if stop) if i != -1]
+    if positions:
+        text = text[:min(positions)]
+    return {**result, result_key: text.rstrip()}
+
+
+async def run_many(coros, max_concurrency=10):
+    """
+    Exécute plusieurs coroutines en parallèle en limitant la concurrence.
+    Args:
+        coros (iterable): Les coroutines à exécuter (ex: agent.acheck_compliance(...)).
+        max_concurrency (int): Le nombre maximal d'appels simultanés.
+    Returns:
+        list: Les résultats, dans l'ordre des coroutines fournies.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _bounded(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(_bounded(coro) for coro in coros))
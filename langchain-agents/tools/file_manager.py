@@ -1,6 +1,114 @@
+import mmap
 import os
 
+# Au-delà de cette taille, le fichier est projeté en mémoire (mmap) plutôt que copié par os.read
+MMAP_THRESHOLD = 16 * 1024 * 1024
+# Taille des lectures complémentaires pour les fichiers qui grossissent ou dont la taille est inconnue (/proc)
+READ_CHUNK_SIZE = 64 * 1024
+# Volume accumulé par BatchAppender avant un os.write
+APPEND_BUFFER_SOFT_MAX = 128 * 1024
+
+
+def _decode(data):
+    # Équivalent de open(..., "r", encoding="utf-8") : décodage en un appel puis fins de ligne universelles
+    text = str(data, "utf-8")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def _read_text(file_path):
+    fd = os.open(file_path, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        if size >= MMAP_THRESHOLD:
+            # Décodage direct depuis le cache de pages, sans copie intermédiaire en bytes
+            with mmap.mmap(fd, size, access=mmap.ACCESS_READ) as mapped:
+                return _decode(mapped)
+        # Un seul appel système : l'octet supplémentaire demandé détecte la fin de fichier
+        data = os.read(fd, size + 1)
+        if len(data) > size:
+            chunks = [data]
+            while chunk := os.read(fd, READ_CHUNK_SIZE):
+                chunks.append(chunk)
+            data = b"".join(chunks)
+        return _decode(data)
+    finally:
+        os.close(fd)
+
+
+class BatchAppender:
+    """
+    Ajouts groupés à un fichier : le fichier est ouvert une fois, les écritures sont accumulées
+    en mémoire et envoyées par blocs de APPEND_BUFFER_SOFT_MAX, avec un seul fsync à la fermeture.
+    S'utilise via FileManager.batch_append :
+        with file_manager.batch_append("logs/run.log") as writer:
+            writer.write("ligne\n")
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._fd = None
+        self._buffer = bytearray()
+
+    def __enter__(self):
+        self._fd = os.open(self.file_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        return self
+
+    def write(self, content):
+        """
+        Ajoute du texte au tampon (écrit sur disque dès que le tampon dépasse APPEND_BUFFER_SOFT_MAX).
+        Args:
+            content (str): Le contenu à ajouter.
+        """
+        self._buffer += content.encode("utf-8")
+        if len(self._buffer) >= APPEND_BUFFER_SOFT_MAX:
+            self.flush()
+
+    def flush(self):
+        """
+        Écrit le contenu du tampon dans le fichier (sans fsync).
+        """
+        view = memoryview(self._buffer)
+        while view:
+            view = view[os.write(self._fd, view):]
+        view.release()
+        self._buffer.clear()
+
+    def __exit__(self, exc_type, exc, traceback):
+        try:
+            self.flush()
+            os.fsync(self._fd)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+
 class FileManager:
+    def __init__(self):
+        # Répertoires déjà créés par cette instance : évite un appel à os.makedirs par écriture
+        self._ensured = set()
+
+    def _ensure_dir(self, file_path):
+        # Un nom de fichier sans répertoire (dirname vide) vise le répertoire courant : rien à créer
+        directory = os.path.dirname(file_path)
+        if directory and directory not in self._ensured:
+            os.makedirs(directory, exist_ok=True)
+            self._ensured.add(directory)
+
+    def _recreate_dir(self, file_path):
+        # Le répertoire a pu être supprimé depuis sa mise en cache (nettoyage, autre processus)
+        self._ensured.discard(os.path.dirname(file_path))
+        self._ensure_dir(file_path)
+
+    def _open_text(self, file_path, mode):
+        self._ensure_dir(file_path)
+        try:
+            return open(file_path, mode, encoding="utf-8")
+        except FileNotFoundError:
+            self._recreate_dir(file_path)
+            return open(file_path, mode, encoding="utf-8")
+
     def read_file(self, file_path):
         """
         Lit le contenu d'un fichier texte.
@@ -10,13 +118,28 @@ class FileManager:
             str: Le contenu du fichier ou un message d'erreur.
         """
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                return f.read()
+            return _read_text(file_path)
         except FileNotFoundError:
             return f"Erreur: Le fichier {file_path} n'a pas été trouvé."
         except Exception as e:
             return f"Erreur lors de la lecture du fichier {file_path}: {e}"
 
+    def iter_lines(self, file_path, chunk=READ_CHUNK_SIZE):
+        """
+        Lit un fichier texte ligne par ligne, par blocs de chunk octets : la mémoire utilisée ne dépend pas
+        de la taille du fichier, et l'appelant peut s'arrêter après les premières lignes.
+        Args:
+            file_path (str): Le chemin complet du fichier.
+            chunk (int): La taille du tampon de lecture, en octets.
+        Yields:
+            str: Les lignes, fin de ligne ("\\n") comprise.
+        Raises:
+            OSError: Si le fichier ne peut être ouvert (contrairement à read_file, aucune chaîne d'erreur n'est produite).
+        """
+        # Le décodeur incrémental du mode texte gère les caractères UTF-8 coupés entre deux blocs
+        with open(file_path, "r", encoding="utf-8", buffering=chunk) as f:
+            yield from f
+
     def write_file(self, file_path, content):
         """
         Écrit du contenu dans un fichier texte. Crée le fichier s'il n'existe pas.
@@ -27,9 +150,8 @@ class FileManager:
             str: Message de succès ou d'erreur.
         """
         try:
-            # Assurez-vous que le répertoire existe
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            with open(file_path, "w", encoding="utf-8") as f:
+            # Le répertoire est créé s'il n'existe pas (ou plus)
+            with self._open_text(file_path, "w") as f:
                 f.write(content)
             return f"Contenu écrit avec succès dans {file_path}."
         except Exception as e:
@@ -45,13 +167,25 @@ class FileManager:
             str: Message de succès ou d'erreur.
         """
         try:
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            with open(file_path, "a", encoding="utf-8") as f:
+            with self._open_text(file_path, "a") as f:
                 f.write(content)
             return f"Contenu ajouté avec succès à {file_path}."
         except Exception as e:
             return f"Erreur lors de l'ajout au fichier {file_path}: {e}"
 
+    def batch_append(self, file_path):
+        """
+        Ouvre un ajout groupé à un fichier, pour les boucles qui ajoutent beaucoup de petites lignes
+        (append_to_file reste adapté aux ajouts ponctuels). Crée le fichier s'il n'existe pas.
+        Args:
+            file_path (str): Le chemin complet du fichier.
+        Returns:
+            BatchAppender: Le gestionnaire de contexte à utiliser dans un bloc with.
+        """
+        # Une fois par lot : le répertoire est revérifié même s'il figure déjà dans le cache
+        self._recreate_dir(file_path)
+        return BatchAppender(file_path)
+
 if __name__ == "__main__":
     # Exemple d'utilisation (pour les tests locaux)
     file_manager = FileManager()
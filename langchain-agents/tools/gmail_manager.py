@@ -1,52 +1,81 @@
-import os
-import json
 import base64
+import os
+import sys
 from email.mime.text import MIMEText
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from tools.auth import get_service  # noqa: E402
+from tools.google_api import api_method, execute, execute_batch, safe_call  # noqa: E402
+
+GMAIL_SCOPES = (
+    "https://www.googleapis.com/auth/gmail.send",
+)
+
+# Nombre maximal de requêtes acceptées par Gmail dans un même BatchHttpRequest
+GMAIL_BATCH_SIZE = 100
+
+def _message_body(to, subject, message_text):
+    message = MIMEText(message_text)
+    message["to"] = to
+    message["subject"] = subject
+    return {"raw": base64.urlsafe_b64encode(message.as_bytes()).decode()}
 
 class GmailManager:
-    def __init__(self):
-        self.creds = self._get_credentials()
-        self.service = build("gmail", "v1", credentials=self.creds)
+    # Services obtenus au premier appel d'API : instancier le manager
+    # (ex: à l'enregistrement des outils d'un agent) ne coûte rien
+    @property
+    def service(self):
+        return get_service("gmail", "v1", GMAIL_SCOPES)
 
-    def _get_credentials(self):
-        creds_json = os.getenv("GOOGLE_CREDENTIALS")
-        if not creds_json:
-            raise ValueError("GOOGLE_CREDENTIALS environment variable not set.")
-        
-        creds_info = json.loads(creds_json)
-        creds = service_account.Credentials.from_service_account_info(
-            creds_info,
-            scopes=["https://www.googleapis.com/auth/gmail.send"]
-         )
-        return creds
+    def _send_request(self, to, subject, message_text):
+        return self.service.users().messages().send(userId="me", body=_message_body(to, subject, message_text))
 
+    @api_method("l'envoi de l'email")
     def send_email(self, to, subject, message_text):
         """
         Envoie un email via Gmail.
         Args:
-            to (str): L'adresse email du destinataire.
+            to (str | list): L'adresse email du destinataire, ou une liste d'adresses
+                (un message par destinataire, envoyés par lots via send_emails).
             subject (str): Le sujet de l'email.
             message_text (str): Le corps du message.
         Returns:
-            dict: Le résultat de l'opération d'envoi.
+            dict: {"message_id": ...}, ou la liste de send_emails si plusieurs destinataires.
+        Raises:
+            ApiError: Si l'envoi échoue.
         """
-        try:
-            message = MIMEText(message_text)
-            message["to"] = to
-            message["subject"] = subject
-            raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
-            
-            send_message = (
-                self.service.users()
-                .messages()
-                .send(userId="me", body={"raw": raw_message})
-                .execute()
-            )
-            return {"status": "success", "message_id": send_message["id"]}
-        except Exception as e:
-            return {"status": "error", "message": f"Erreur lors de l'envoi de l'email: {e}"}
+        if isinstance(to, (list, tuple)):
+            return self.send_emails([(recipient, subject, message_text) for recipient in to])
+        send_message = execute(self._send_request(to, subject, message_text))
+        return {"message_id": send_message["id"]}
+
+    @api_method("l'envoi des emails")
+    def send_emails(self, messages):
+        """
+        Envoie plusieurs emails en regroupant les envois par lots de GMAIL_BATCH_SIZE
+        (un aller-retour HTTP par lot au lieu d'un par message).
+        Args:
+            messages (list): Des tuples (to, subject, message_text).
+        Returns:
+            list: Dans l'ordre des messages, {"status": "success", "message_id": ...}
+                ou {"status": "error", "message": ...}.
+        Raises:
+            ApiError: Si un lot entier échoue (les erreurs par message sont rapportées dans la liste).
+        """
+        responses = execute_batch(
+            self.service,
+            ((str(i), self._send_request(*message)) for i, message in enumerate(messages)),
+            GMAIL_BATCH_SIZE,
+        )
+        results = []
+        for i in range(len(messages)):
+            response = responses.get(str(i), {"status": "error", "message": "Aucune réponse du lot."})
+            if response["status"] == "success":
+                response = {"status": "success", "message_id": response["response"]["id"]}
+            else:
+                response = {"status": "error", "message": f"Erreur lors de l'envoi de l'email: {response['message']}"}
+            results.append(response)
+        return results
 
 if __name__ == "__main__":
     # Exemple d'utilisation (pour les tests locaux)
@@ -62,7 +91,8 @@ if __name__ == "__main__":
         print("Veuillez remplacer votre_email@example.com par une adresse email valide pour tester l'envoi.")
     else:
         print("\n--- Envoi d'email de test ---")
-        send_result = gmail_manager.send_email(
+        send_result = safe_call(
+            gmail_manager.send_email,
             TEST_EMAIL_TO,
             "Test d'email depuis l'IA MFR",
             "Ceci est un email de test envoyé automatiquement par l'agent IA de MFR."
@@ -0,0 +1,209 @@
+import functools
+import inspect
+import itertools
+import ssl
+
+from googleapiclient.errors import HttpError
+from httplib2 import ServerNotFoundError
+from tenacity import retry, stop_after_attempt, wait_exponential, wait_random
+
+MAX_ATTEMPTS = 5
+BASE_BACKOFF_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 16
+MAX_JITTER_SECONDS = 0.5
+# Statuts HTTP transitoires : quota dépassé ou indisponibilité côté Google
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+# Erreurs réseau (socket coupée, délai dépassé, poignée de main TLS interrompue)
+RETRYABLE_NETWORK_ERRORS = (ConnectionError, TimeoutError, ssl.SSLError)
+# Raisons d'un 403 qui signalent un dépassement de quota (à retenter) plutôt qu'un refus d'accès
+RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+# Méthodes HTTP qu'on peut rejouer sans risque de doublon
+IDEMPOTENT_METHODS = ("GET", "HEAD", "PUT", "DELETE")
+# Erreurs réseau levées avant l'envoi de la requête (DNS, connexion refusée) : rien n'a atteint le serveur
+PRE_SEND_NETWORK_ERRORS = (ServerNotFoundError, ConnectionRefusedError)
+
+
+class ApiError(Exception):
+    """
+    Échec d'une méthode d'un manager Google (après les reprises de execute()).
+    Attributes:
+        method (str): Le nom de la méthode en échec.
+        original (Exception): L'erreur d'origine (HttpError, ValueError, ...).
+    """
+
+    def __init__(self, method, original, label=None):
+        self.method = method
+        self.original = original
+        super().__init__(f"Erreur lors de {label or method}: {original}")
+
+
+def api_method(label):
+    """
+    Décorateur des méthodes publiques des managers Google : toute erreur est levée en ApiError
+    (générateurs et coroutines compris), avec un message "Erreur lors de <label>: <erreur d'origine>".
+    Args:
+        label (str): L'opération, telle qu'insérée dans le message (ex: "l'envoi de l'email").
+    """
+    def decorator(fn):
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                try:
+                    yield from fn(*args, **kwargs)
+                except ApiError:
+                    raise
+                except Exception as e:
+                    raise ApiError(fn.__name__, e, label) from e
+            return generator_wrapper
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def coroutine_wrapper(*args, **kwargs):
+                try:
+                    return await fn(*args, **kwargs)
+                except ApiError:
+                    raise
+                except Exception as e:
+                    raise ApiError(fn.__name__, e, label) from e
+            return coroutine_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            try:
+                return fn(*args, **kwargs)
+            except ApiError:
+                raise
+            except Exception as e:
+                raise ApiError(fn.__name__, e, label) from e
+        return wrapper
+    return decorator
+
+
+def safe_call(fn, *args, **kwargs):
+    """
+    Appelle une méthode de manager en renvoyant l'ancien format de résultat plutôt qu'en levant ApiError
+    (pour les appelants, comme les outils LangChain, qui attendent un dictionnaire de statut).
+    Args:
+        fn (callable): La méthode à appeler (ex: gmail_manager.send_email).
+        *args, **kwargs: Ses arguments.
+    Returns:
+        dict: {"status": "success", "result": ...} ou {"status": "error", "message": ...}.
+    """
+    try:
+        return {"status": "success", "result": fn(*args, **kwargs)}
+    except ApiError as e:
+        return {"status": "error", "message": str(e)}
+
+
+def _chunks(items, size):
+    # Équivalent de itertools.batched (Python 3.12+)
+    iterator = iter(items)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def execute_batch(service, requests, batch_size):
+    """
+    Exécute des requêtes Google API par lots BatchHttpRequest : un aller-retour HTTP par lot
+    au lieu d'un par requête.
+    Args:
+        service: Le service googleapiclient qui fournit new_batch_http_request.
+        requests (iterable): Des couples (request_id, HttpRequest non exécutée).
+        batch_size (int): Le nombre maximal de requêtes par lot (100 pour Gmail, 50 pour Classroom).
+    Returns:
+        dict: {request_id: {"status": "success", "response": ...} ou {"status": "error", "message": ...}}.
+            Les erreurs de chaque requête sont rapportées par élément ; seul l'échec d'un lot entier est levé.
+    """
+    results = {}
+
+    def _callback(request_id, response, exception):
+        if exception is not None:
+            results[request_id] = {"status": "error", "message": str(exception)}
+        else:
+            results[request_id] = {"status": "success", "response": response}
+
+    for chunk in _chunks(requests, batch_size):
+        batch = service.new_batch_http_request(callback=_callback)
+        for request_id, request in chunk:
+            batch.add(request, request_id=request_id)
+        batch.execute()
+    return results
+
+
+def _is_rate_limited(error):
+    if not isinstance(error, HttpError):
+        return False
+    if error.status_code == 429:
+        return True
+    return error.status_code == 403 and any(
+        detail.get("reason") in RATE_LIMIT_REASONS for detail in error.error_details or [] if isinstance(detail, dict)
+    )
+
+
+def _is_transient(error):
+    if isinstance(error, RETRYABLE_NETWORK_ERRORS) or _is_rate_limited(error):
+        return True
+    return isinstance(error, HttpError) and error.status_code in RETRYABLE_STATUSES
+
+
+def _is_not_processed(error):
+    # Requête refusée pour quota ou jamais envoyée : la rejouer ne crée pas de doublon
+    return _is_rate_limited(error) or isinstance(error, PRE_SEND_NETWORK_ERRORS)
+
+
+def _should_retry(retry_state):
+    # Une erreur 5xx ou un délai dépassé peut survenir après que le serveur a traité la requête :
+    # seules les requêtes idempotentes sont alors rejouées (sinon un email ou une annonce partirait deux fois)
+    if not retry_state.outcome.failed:
+        return False
+    error = retry_state.outcome.exception()
+    request = retry_state.args[0] if retry_state.args else retry_state.kwargs["request"]
+    idempotent = retry_state.kwargs.get("idempotent")
+    if idempotent is None:
+        idempotent = request.method in IDEMPOTENT_METHODS
+    return _is_transient(error) if idempotent else _is_not_processed(error)
+
+
+# Politique de reprise commune aux appels Google API : min(16, 0.5 * 2^n) s plus un jitter de 0 à 0.5 s ;
+# seule l'erreur de la dernière tentative remonte, en ApiError, depuis les managers
+google_retry = retry(
+    retry=_should_retry,
+    wait=wait_exponential(multiplier=BASE_BACKOFF_SECONDS, max=MAX_BACKOFF_SECONDS) + wait_random(0, MAX_JITTER_SECONDS),
+    stop=stop_after_attempt(MAX_ATTEMPTS),
+    reraise=True,
+)
+
+
+@google_retry
+def execute(request, http=None, idempotent=None):
+    """
+    Exécute une requête Google API, en la retentant avec un backoff exponentiel (avec jitter)
+    sur les erreurs transitoires : quota dépassé (429, 403 rateLimitExceeded), erreurs 5xx, coupures réseau.
+    Une requête non idempotente (POST de création ou d'envoi) n'est retentée que sur un refus pour quota
+    ou une erreur réseau antérieure à l'envoi.
+    Args:
+        request (HttpRequest): La requête googleapiclient non exécutée.
+        http (AuthorizedHttp, optional): Le client HTTP à utiliser (un par thread, voir auth.get_thread_http).
+        idempotent (bool, optional): Force le caractère rejouable de la requête ; par défaut, déduit de
+            sa méthode HTTP (GET, HEAD, PUT, DELETE).
+    Returns:
+        dict: La réponse décodée.
+    """
+    return request.execute(http=http)
+
+
+def iter_pages(collection, request, items_key):
+    """
+    Parcourt toutes les pages d'une méthode list() en suivant nextPageToken via list_next().
+    Les éléments sont produits au fil des pages : l'appelant peut s'arrêter avant la dernière.
+    Args:
+        collection: La collection dont request est issue (ex: service.files()), qui fournit list_next.
+        request (HttpRequest): La requête list() de la première page.
+        items_key (str): La clé des éléments dans la réponse (ex: "files", "courses").
+    Yields:
+        dict: Les éléments, page après page.
+    """
+    while request is not None:
+        response = execute(request)
+        yield from response.get(items_key, [])
+        request = collection.list_next(request, response)
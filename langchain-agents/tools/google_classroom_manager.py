@@ -1,43 +1,78 @@
 import os
-import json
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from tools.auth import get_service  # noqa: E402
+from tools.google_api import api_method, execute, execute_batch, iter_pages, safe_call  # noqa: E402
+
+CLASSROOM_SCOPES = (
+    "https://www.googleapis.com/auth/classroom.courses.readonly",
+    "https://www.googleapis.com/auth/classroom.announcements",
+    "https://www.googleapis.com/auth/classroom.coursework.students",
+    "https://www.googleapis.com/auth/classroom.rosters",
+)
+
+# Taille de lot prudente vis-à-vis des quotas Classroom (un BatchHttpRequest en accepte jusqu'à 1000)
+CLASSROOM_BATCH_SIZE = 50
+# Taille de page demandée à courses.list (le serveur peut en renvoyer moins)
+COURSES_PAGE_SIZE = 100
+# Appels simultanés par défaut hors BatchHttpRequest ; à réduire si le quota par projet est serré
+DEFAULT_MAX_WORKERS = 8
+
+def _announcement_body(text):
+    return {
+        "text": text,
+        "state": "PUBLISHED"
+    }
+
+
+def _coursework_body(title, description, materials=None):
+    return {
+        "title": title,
+        "description": description,
+        "workType": "ASSIGNMENT",
+        "state": "PUBLISHED",
+        "materials": materials if materials else []
+    }
 
 class GoogleClassroomManager:
-    def __init__(self):
-        self.creds = self._get_credentials()
-        self.service = build("classroom", "v1", credentials=self.creds)
-
-    def _get_credentials(self):
-        creds_json = os.getenv("GOOGLE_CREDENTIALS")
-        if not creds_json:
-            raise ValueError("GOOGLE_CREDENTIALS environment variable not set.")
-        
-        creds_info = json.loads(creds_json)
-        creds = service_account.Credentials.from_service_account_info(
-            creds_info,
-            scopes=[
-                "https://www.googleapis.com/auth/classroom.courses.readonly",
-                "https://www.googleapis.com/auth/classroom.announcements",
-                "https://www.googleapis.com/auth/classroom.coursework.students",
-                "https://www.googleapis.com/auth/classroom.rosters"
-            ]
-         )
-        return creds
+    # Services obtenus au premier appel d'API : instancier le manager
+    # (ex: à l'enregistrement des outils d'un agent) ne coûte rien
+    @property
+    def service(self):
+        return get_service("classroom", "v1", CLASSROOM_SCOPES)
+
+    @api_method("la liste des cours")
+    def iter_courses(self):
+        """
+        Liste les cours Google Classroom, page par page.
+        Yields:
+            dict: Les cours.
+        Raises:
+            ApiError: Si une page ne peut être lue.
+        """
+        courses = self.service.courses()
+        yield from iter_pages(courses, courses.list(pageSize=COURSES_PAGE_SIZE), "courses")
 
     def list_courses(self):
         """
-        Liste les cours Google Classroom.
+        Liste les cours Google Classroom (toutes les pages de résultats).
         Returns:
             list: Une liste de dictionnaires représentant les cours.
+        Raises:
+            ApiError: Si une page ne peut être lue.
         """
-        try:
-            results = self.service.courses().list().execute()
-            courses = results.get("courses", [])
-            return {"status": "success", "courses": courses}
-        except Exception as e:
-            return {"status": "error", "message": f"Erreur lors de la liste des cours: {e}"}
+        return list(self.iter_courses())
+
+    def _announcement_request(self, course_id, text):
+        return self.service.courses().announcements().create(courseId=course_id, body=_announcement_body(text))
+
+    def _coursework_request(self, course_id, title, description, materials=None):
+        body = _coursework_body(title, description, materials)
+        return self.service.courses().courseWork().create(courseId=course_id, body=body)
 
+    @api_method("la création de l'annonce")
     def create_announcement(self, course_id, text):
         """
         Crée une annonce dans un cours Google Classroom.
@@ -46,18 +81,12 @@ class GoogleClassroomManager:
             text (str): Le texte de l'annonce.
         Returns:
             dict: Les métadonnées de l'annonce créée.
+        Raises:
+            ApiError: Si la création échoue.
         """
-        try:
-            announcement = {
-                "text": text,
-                "state": "PUBLISHED"
-            }
-            result = self.service.courses().announcements().create(
-                courseId=course_id, body=announcement).execute()
-            return {"status": "success", "announcement": result}
-        except Exception as e:
-            return {"status": "error", "message": f"Erreur lors de la création de l'annonce: {e}"}
+        return execute(self._announcement_request(course_id, text))
 
+    @api_method("la création du devoir")
     def create_coursework(self, course_id, title, description, materials=None):
         """
         Crée un devoir dans un cours Google Classroom.
@@ -68,20 +97,85 @@ class GoogleClassroomManager:
             materials (list): Liste d'objets material (ex: {'link': {'url': '...'}}).
         Returns:
             dict: Les métadonnées du devoir créé.
+        Raises:
+            ApiError: Si la création échoue.
+        """
+        return execute(self._coursework_request(course_id, title, description, materials))
+
+    def _create_many(self, requests, result_key, error_label):
+        responses = execute_batch(self.service, requests, CLASSROOM_BATCH_SIZE)
+        results = {}
+        for request_id, response in responses.items():
+            if response["status"] == "success":
+                results[request_id] = {"status": "success", result_key: response["response"]}
+            else:
+                results[request_id] = {"status": "error", "message": f"Erreur lors de {error_label}: {response['message']}"}
+        return results
+
+    @api_method("la création des annonces")
+    def create_announcements(self, items):
+        """
+        Publie plusieurs annonces (ex: la même annonce dans toutes les classes) par lots
+        BatchHttpRequest de CLASSROOM_BATCH_SIZE, au lieu d'un appel API par cours.
+        Args:
+            items (list): Des tuples (course_id, text).
+        Returns:
+            dict: {"a0": {"status": "success", "announcement": ...} ou {"status": "error", "message": ...}, ...},
+                indexés par "a<position de l'élément>".
+        Raises:
+            ApiError: Si un lot entier échoue.
+        """
+        return self._create_many(
+            ((f"a{i}", self._announcement_request(course_id, text)) for i, (course_id, text) in enumerate(items)),
+            "announcement",
+            "la création de l'annonce",
+        )
+
+    @api_method("la création des devoirs")
+    def create_courseworks(self, items):
+        """
+        Crée plusieurs devoirs par lots BatchHttpRequest de CLASSROOM_BATCH_SIZE.
+        Args:
+            items (list): Des tuples (course_id, title, description) ou (course_id, title, description, materials).
+        Returns:
+            dict: {"c0": {"status": "success", "coursework": ...} ou {"status": "error", "message": ...}, ...},
+                indexés par "c<position de l'élément>".
+        Raises:
+            ApiError: Si un lot entier échoue.
+        """
+        return self._create_many(
+            ((f"c{i}", self._coursework_request(*item)) for i, item in enumerate(items)),
+            "coursework",
+            "la création du devoir",
+        )
+
+    def _create_announcement_in_thread(self, course_id, text):
+        # self.service est celui du thread courant : chaque thread exécute avec son propre client HTTP
+        return execute(self._announcement_request(course_id, text))
+
+    def create_announcements_parallel(self, items, max_workers=DEFAULT_MAX_WORKERS):
+        """
+        Publie plusieurs annonces via un pool de threads, quand le regroupement en BatchHttpRequest
+        ne convient pas. Les dépassements de quota (429) sont retentés avec un backoff exponentiel.
+        Args:
+            items (list): Des tuples (course_id, text).
+            max_workers (int): Le nombre d'appels simultanés (à ajuster selon le quota du projet).
+        Returns:
+            list: Dans l'ordre des éléments, {"status": "success", "announcement": ...}
+                ou {"status": "error", "message": ...}.
         """
-        try:
-            coursework = {
-                "title": title,
-                "description": description,
-                "workType": "ASSIGNMENT",
-                "state": "PUBLISHED",
-                "materials": materials if materials else []
+        results = [None] * len(items)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self._create_announcement_in_thread, course_id, text): i
+                for i, (course_id, text) in enumerate(items)
             }
-            result = self.service.courses().courseWork().create(
-                courseId=course_id, body=coursework).execute()
-            return {"status": "success", "coursework": result}
-        except Exception as e:
-            return {"status": "error", "message": f"Erreur lors de la création du devoir: {e}"}
+            for future in as_completed(futures):
+                try:
+                    results[futures[future]] = {"status": "success", "announcement": future.result()}
+                except Exception as e:
+                    results[futures[future]] = {"status": "error", "message": f"Erreur lors de la création de l'annonce: {e}"}
+        return results
 
 if __name__ == "__main__":
     # Exemple d'utilisation (pour les tests locaux)
@@ -92,7 +186,7 @@ if __name__ == "__main__":
 
     # 1. Lister les cours (nécessite des cours existants)
     print("\n--- Liste des cours ---")
-    courses_result = classroom_manager.list_courses()
+    courses_result = safe_call(classroom_manager.list_courses)
     print(courses_result)
 
     # Remplacez par un ID de cours valide pour les tests suivants
@@ -101,14 +195,15 @@ if __name__ == "__main__":
     if test_course_id != "YOUR_COURSE_ID_HERE":
         # 2. Créer une annonce
         print("\n--- Création d'une annonce ---")
-        announcement_result = classroom_manager.create_announcement(
-            test_course_id, "Bonjour la classe ! Nouvelle annonce de l'IA."
+        announcement_result = safe_call(
+            classroom_manager.create_announcement, test_course_id, "Bonjour la classe ! Nouvelle annonce de l'IA."
         )
         print(announcement_result)
 
         # 3. Créer un devoir
         print("\n--- Création d'un devoir ---")
-        coursework_result = classroom_manager.create_coursework(
+        coursework_result = safe_call(
+            classroom_manager.create_coursework,
             test_course_id,
             "Devoir généré par l'IA",
             "Veuillez compléter les exercices joints.",
@@ -1,44 +1,75 @@
 import os
-import json
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+import sys
+from contextlib import contextmanager
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from tools.auth import get_service  # noqa: E402
+from tools.google_api import api_method, execute, safe_call  # noqa: E402
+
+DOCS_SCOPES = (
+    "https://www.googleapis.com/auth/documents",
+    "https://www.googleapis.com/auth/drive",
+)
+
+
+def _replace_all_request(old_text, new_text, match_case):
+    return {
+        'replaceAllText': {
+            'replaceText': new_text,
+            'containsText': {
+                'text': old_text,
+                'matchCase': match_case
+            }
+        }
+    }
+
+
+class _DocumentBatch:
+    # Vue d'un document dont les modifications sont mises en attente jusqu'au flush
+    def __init__(self, manager, document_id):
+        self._manager = manager
+        self._document_id = document_id
+
+    def insert_text(self, text, index=1):
+        return self._manager.insert_text(self._document_id, text, index, defer=True)
+
+    def replace_text(self, old_text, new_text):
+        return self._manager.replace_text(self._document_id, old_text, new_text, defer=True)
+
 
 class GoogleDocsManager:
     def __init__(self):
-        self.creds = self._get_credentials()
-        self.docs_service = build('docs', 'v1', credentials=self.creds)
-        self.drive_service = build('drive', 'v3', credentials=self.creds) # Nécessaire pour créer des copies
-
-    def _get_credentials(self):
-        creds_json = os.getenv("GOOGLE_CREDENTIALS")
-        if not creds_json:
-            raise ValueError("GOOGLE_CREDENTIALS environment variable not set.")
-        
-        creds_info = json.loads(creds_json)
-        creds = service_account.Credentials.from_service_account_info(
-            creds_info,
-            scopes=[
-                'https://www.googleapis.com/auth/documents',
-                'https://www.googleapis.com/auth/drive'
-            ]
-         )
-        return creds
+        # Requêtes batchUpdate en attente, par document, envoyées en un seul appel par flush()
+        self._pending = {}
+        self.last_flush = None
+
+    # Services obtenus au premier appel d'API : instancier le manager
+    # (ex: à l'enregistrement des outils d'un agent) ne coûte rien
+    @property
+    def docs_service(self):
+        return get_service("docs", "v1", DOCS_SCOPES)
 
+    @property
+    def drive_service(self):
+        # Nécessaire pour créer des copies
+        return get_service("drive", "v3", DOCS_SCOPES)
+
+    @api_method("la création du document")
     def create_document(self, title):
         """
         Crée un nouveau document Google Docs.
         Args:
             title (str): Le titre du nouveau document.
         Returns:
-            dict: Les métadonnées du document créé.
+            dict: Les métadonnées du document créé ({"document_id", "document_url"}).
+        Raises:
+            ApiError: Si la création échoue.
         """
-        try:
-            document = {'title': title}
-            doc = self.docs_service.documents().create(body=document).execute()
-            return {"status": "success", "document_id": doc.get('documentId'), "document_url": doc.get('webViewLink')}
-        except Exception as e:
-            return {"status": "error", "message": f"Erreur lors de la création du document: {e}"}
+        document = {'title': title}
+        doc = execute(self.docs_service.documents().create(body=document))
+        return {"document_id": doc.get('documentId'), "document_url": doc.get('webViewLink')}
 
+    @api_method("la copie du document")
     def copy_document(self, source_document_id, new_title):
         """
         Crée une copie d'un document Google Docs existant.
@@ -46,70 +77,132 @@ class GoogleDocsManager:
             source_document_id (str): L'ID du document source.
             new_title (str): Le titre du nouveau document copié.
         Returns:
-            dict: Les métadonnées du document copié.
+            dict: Les métadonnées du document copié ({"document_id", "document_url"}).
+        Raises:
+            ApiError: Si la copie échoue.
         """
-        try:
-            copy_body = {'name': new_title}
-            copied_doc = self.drive_service.files().copy(
-                fileId=source_document_id, body=copy_body).execute()
-            return {"status": "success", "document_id": copied_doc.get('id'), "document_url": copied_doc.get('webViewLink')}
-        except Exception as e:
-            return {"status": "error", "message": f"Erreur lors de la copie du document: {e}"}
+        copy_body = {'name': new_title}
+        copied_doc = execute(self.drive_service.files().copy(
+            fileId=source_document_id, body=copy_body))
+        return {"document_id": copied_doc.get('id'), "document_url": copied_doc.get('webViewLink')}
 
-    def insert_text(self, document_id, text, index=1):
+    @api_method("la mise à jour du document")
+    def apply_requests(self, document_id, requests_list):
+        """
+        Envoie une liste de requêtes Docs (insertText, replaceAllText, ...) en un seul batchUpdate.
+        Args:
+            document_id (str): L'ID du document.
+            requests_list (list): Les requêtes batchUpdate, appliquées dans l'ordre.
+        Returns:
+            dict: La réponse de batchUpdate (une entrée de "replies" par requête).
+        Raises:
+            ApiError: Si la mise à jour échoue.
+        """
+        return self._batch_update(document_id, requests_list)
+
+    def _batch_update(self, document_id, requests_list):
+        return execute(self.docs_service.documents().batchUpdate(
+            documentId=document_id, body={'requests': requests_list}))
+
+    def _submit(self, document_id, request, defer):
+        if defer:
+            self._pending.setdefault(document_id, []).append(request)
+            return {"queued": len(self._pending[document_id])}
+        return self._batch_update(document_id, [request])
+
+    @api_method("l'insertion de texte")
+    def insert_text(self, document_id, text, index=1, defer=False):
         """
         Insère du texte dans un document Google Docs à un index donné.
         Args:
             document_id (str): L'ID du document.
             text (str): Le texte à insérer.
             index (int): L'index où insérer le texte (par défaut 1 pour le début du corps).
+            defer (bool): Si True, la requête est mise en attente jusqu'au prochain flush(document_id).
         Returns:
-            dict: Le résultat de l'opération.
+            dict: La réponse de batchUpdate, ou {"queued": nombre de requêtes en attente} si defer=True.
+        Raises:
+            ApiError: Si l'insertion échoue.
         """
-        try:
-            requests = [
-                {
-                    'insertText': {
-                        'location': {
-                            'index': index,
-                        },
-                        'text': text
-                    }
-                }
-            ]
-            result = self.docs_service.documents().batchUpdate(
-                documentId=document_id, body={'requests': requests}).execute()
-            return {"status": "success", "result": result}
-        except Exception as e:
-            return {"status": "error", "message": f"Erreur lors de l'insertion de texte: {e}"}
-
-    def replace_text(self, document_id, old_text, new_text):
+        request = {
+            'insertText': {
+                'location': {
+                    'index': index,
+                },
+                'text': text
+            }
+        }
+        return self._submit(document_id, request, defer)
+
+    @api_method("le remplacement de texte")
+    def replace_text(self, document_id, old_text, new_text, defer=False):
         """
         Remplace toutes les occurrences d'un texte par un autre dans un document.
         Args:
             document_id (str): L'ID du document.
             old_text (str): Le texte à remplacer.
             new_text (str): Le nouveau texte.
+            defer (bool): Si True, la requête est mise en attente jusqu'au prochain flush(document_id).
+        Returns:
+            dict: La réponse de batchUpdate, ou {"queued": nombre de requêtes en attente} si defer=True.
+        Raises:
+            ApiError: Si le remplacement échoue.
+        """
+        request = _replace_all_request(old_text, new_text, match_case=False)
+        return self._submit(document_id, request, defer)
+
+    @api_method("le remplissage du modèle")
+    def render_template(self, document_id, mapping):
+        """
+        Remplit un document modèle en remplaçant tous ses champs en un seul batchUpdate
+        (au lieu d'un appel replace_text par champ).
+        Args:
+            document_id (str): L'ID du document (en général une copie du modèle, voir copy_document).
+            mapping (dict): {champ tel qu'écrit dans le modèle (ex: "{nom}"): valeur}, sensible à la casse.
         Returns:
-            dict: Le résultat de l'opération.
+            dict: La réponse de batchUpdate (occurrencesChanged par champ dans "replies"), ou None si mapping est vide.
+        Raises:
+            ApiError: Si le remplissage échoue.
+        """
+        requests_list = [_replace_all_request(field, str(value), match_case=True) for field, value in mapping.items()]
+        if not requests_list:
+            return None
+        return self._batch_update(document_id, requests_list)
+
+    @api_method("la mise à jour du document")
+    def flush(self, document_id):
+        """
+        Envoie en un seul batchUpdate toutes les modifications en attente d'un document.
+        Args:
+            document_id (str): L'ID du document.
+        Returns:
+            dict: La réponse de batchUpdate, ou None si rien n'était en attente.
+        Raises:
+            ApiError: Si la mise à jour échoue (les modifications en attente sont perdues).
+        """
+        requests_list = self._pending.pop(document_id, [])
+        if not requests_list:
+            return None
+        return self._batch_update(document_id, requests_list)
+
+    @contextmanager
+    def batch(self, document_id):
+        """
+        Regroupe les modifications d'un document, envoyées en un seul batchUpdate à la sortie du bloc :
+            with docs_manager.batch(doc_id) as b:
+                b.insert_text("...")
+                b.replace_text("{nom}", "Dupont")
+        Les modifications sont abandonnées si le bloc lève une exception ; un échec du flush lève ApiError.
+        La réponse du flush est disponible dans docs_manager.last_flush.
+        Args:
+            document_id (str): L'ID du document.
         """
         try:
-            requests = [
-                {
-                    'replaceAllText': {
-                        'replaceText': new_text,
-                        'containsText': {
-                            'text': old_text,
-                            'matchCase': 'false'
-                        }
-                    }
-                }
-            ]
-            result = self.docs_service.documents().batchUpdate(
-                documentId=document_id, body={'requests': requests}).execute()
-            return {"status": "success", "result": result}
-        except Exception as e:
-            return {"status": "error", "message": f"Erreur lors du remplacement de texte: {e}"}
+            yield _DocumentBatch(self, document_id)
+        except BaseException:
+            self._pending.pop(document_id, None)
+            raise
+        self.last_flush = self.flush(document_id)
 
 if __name__ == "__main__":
     # Exemple d'utilisation (pour les tests locaux)
@@ -120,19 +213,19 @@ if __name__ == "__main__":
 
     # 1. Créer un nouveau document
     print("\n--- Création d'un nouveau document ---")
-    create_result = docs_manager.create_document("Mon Nouveau Document IA")
+    create_result = safe_call(docs_manager.create_document, "Mon Nouveau Document IA")
     print(create_result)
-    new_doc_id = create_result.get("document_id")
+    new_doc_id = create_result.get("result", {}).get("document_id")
 
     if new_doc_id:
         # 2. Insérer du texte
         print("\n--- Insertion de texte ---")
-        insert_result = docs_manager.insert_text(new_doc_id, "Ceci est le contenu généré par l'IA.\n")
+        insert_result = safe_call(docs_manager.insert_text, new_doc_id, "Ceci est le contenu généré par l'IA.\n")
         print(insert_result)
 
         # 3. Remplacer du texte
         print("\n--- Remplacement de texte ---")
-        replace_result = docs_manager.replace_text(new_doc_id, "contenu généré par l'IA", "texte mis à jour par l'agent")
+        replace_result = safe_call(docs_manager.replace_text, new_doc_id, "contenu généré par l'IA", "texte mis à jour par l'agent")
         print(replace_result)
 
         # 4. Copier le document (nécessite un document source existant)
@@ -140,7 +233,7 @@ if __name__ == "__main__":
         # source_doc_id = 'YOUR_SOURCE_DOCUMENT_ID'
         # if source_doc_id != 'YOUR_SOURCE_DOCUMENT_ID':
         #     print("\n--- Copie du document ---")
-        #     copy_result = docs_manager.copy_document(source_doc_id, "Copie de Mon Document IA")
+        #     copy_result = safe_call(docs_manager.copy_document, source_doc_id, "Copie de Mon Document IA")
         #     print(copy_result)
     else:
         print("Impossible de procéder aux tests d'insertion/remplacement/copie sans ID de document.")
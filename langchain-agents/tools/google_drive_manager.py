@@ -1,50 +1,125 @@
+import io
 import os
-import json
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+import sys
+from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from tools.auth import get_service  # noqa: E402
+from tools.google_api import api_method, execute, iter_pages, safe_call  # noqa: E402
+
+DRIVE_SCOPES = (
+    "https://www.googleapis.com/auth/drive",
+)
+
+# En dessous de ce seuil, upload en une seule requête multipart (au lieu d'ouverture de session + envoi)
+RESUMABLE_THRESHOLD = 5 * 1024 * 1024
+# Taille de page maximale acceptée par files.list
+SEARCH_PAGE_SIZE = 1000
+# Types MIME des extensions courantes, pour ne pas charger la base mimetypes à chaque upload
+_EXT_MIME = {
+    ".pdf": "application/pdf",
+    ".txt": "text/plain",
+    ".csv": "text/csv",
+    ".html": "text/html",
+    ".md": "text/markdown",
+    ".json": "application/json",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".svg": "image/svg+xml",
+    ".mp3": "audio/mpeg",
+    ".mp4": "video/mp4",
+    ".zip": "application/zip",
+    ".doc": "application/msword",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".xls": "application/vnd.ms-excel",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".ppt": "application/vnd.ms-powerpoint",
+    ".pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    ".odt": "application/vnd.oasis.opendocument.text",
+    ".ods": "application/vnd.oasis.opendocument.spreadsheet",
+}
+DEFAULT_MIME_TYPE = "application/octet-stream"
+# Taille des morceaux des uploads reprenables (la valeur par défaut de googleapiclient, 100 Mo, est gardée en mémoire)
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def _guess_mime_type(file_name):
+    return _EXT_MIME.get(os.path.splitext(file_name)[1].lower(), DEFAULT_MIME_TYPE)
+
+
+def _stream_media(stream, mime_type):
+    size = stream.seek(0, io.SEEK_END) - stream.seek(0)
+    return MediaIoBaseUpload(stream, mimetype=mime_type, chunksize=UPLOAD_CHUNK_SIZE, resumable=size >= RESUMABLE_THRESHOLD)
+
 
 class GoogleDriveManager:
-    def __init__(self ):
-        self.creds = self._get_credentials()
-        self.service = build("drive", "v3", credentials=self.creds)
-
-    def _get_credentials(self):
-        creds_json = os.getenv("GOOGLE_CREDENTIALS")
-        if not creds_json:
-            raise ValueError("GOOGLE_CREDENTIALS environment variable not set.")
-        
-        creds_info = json.loads(creds_json)
-        creds = service_account.Credentials.from_service_account_info(
-            creds_info,
-            scopes=["https://www.googleapis.com/auth/drive"]
-         )
-        return creds
-
-    def upload_file(self, file_path, file_name, mime_type, folder_id=None):
+    # Services obtenus au premier appel d'API : instancier le manager
+    # (ex: à l'enregistrement des outils d'un agent) ne coûte rien
+    @property
+    def service(self):
+        return get_service("drive", "v3", DRIVE_SCOPES)
+
+    def _create_file(self, media, file_name, folder_id):
+        file_metadata = {"name": file_name}
+        if folder_id:
+            file_metadata["parents"] = [folder_id]
+
+        file = execute(self.service.files().create(
+            body=file_metadata, media_body=media, fields="id, webViewLink"
+        ))
+        return {"file_id": file.get("id"), "web_view_link": file.get("webViewLink")}
+
+    @api_method("l'upload du fichier")
+    def upload_bytes(self, data, file_name, mime_type=None, folder_id=None):
         """
-        Uploade un fichier sur Google Drive.
+        Uploade un contenu en mémoire sur Google Drive, sans fichier temporaire.
         Args:
-            file_path (str): Chemin local du fichier à uploader.
+            data (bytes | bytearray | memoryview): Le contenu du fichier.
             file_name (str): Nom du fichier sur Google Drive.
-            mime_type (str): Type MIME du fichier (ex: 'application/pdf', 'image/jpeg').
+            mime_type (str, optional): Type MIME du fichier (ex: 'application/pdf'). Si None, déduit de l'extension de file_name.
             folder_id (str, optional): ID du dossier parent sur Drive. Si None, le fichier est uploadé à la racine.
         Returns:
-            dict: Les métadonnées du fichier uploadé.
+            dict: Les métadonnées du fichier uploadé ({"file_id", "web_view_link"}).
+        Raises:
+            ApiError: Si l'upload échoue.
         """
-        try:
-            file_metadata = {"name": file_name}
-            if folder_id:
-                file_metadata["parents"] = [folder_id]
-
-            media = MediaFileUpload(file_path, mimetype=mime_type, resumable=True)
-            file = self.service.files().create(
-                body=file_metadata, media_body=media, fields="id, webViewLink"
-            ).execute()
-            return {"status": "success", "file_id": file.get("id"), "web_view_link": file.get("webViewLink")}
-        except Exception as e:
-            return {"status": "error", "message": f"Erreur lors de l'upload du fichier: {e}"}
+        mime_type = mime_type or _guess_mime_type(file_name)
+        return self._create_file(_stream_media(io.BytesIO(data), mime_type), file_name, folder_id)
 
+    @api_method("l'upload du fichier")
+    def upload_file(self, file_path, file_name, mime_type=None, folder_id=None):
+        """
+        Uploade un fichier sur Google Drive : en une requête sous RESUMABLE_THRESHOLD,
+        en upload reprenable par morceaux de UPLOAD_CHUNK_SIZE au-delà.
+        Args:
+            file_path (str | bytes | file object): Chemin local du fichier à uploader, ou son contenu
+                (bytes, ou flux binaire positionnable comme io.BytesIO) pour éviter un fichier temporaire.
+            file_name (str): Nom du fichier sur Google Drive.
+            mime_type (str, optional): Type MIME du fichier (ex: 'application/pdf', 'image/jpeg').
+                Si None, déduit de l'extension de file_name (application/octet-stream si inconnue).
+            folder_id (str, optional): ID du dossier parent sur Drive. Si None, le fichier est uploadé à la racine.
+        Returns:
+            dict: Les métadonnées du fichier uploadé ({"file_id", "web_view_link"}).
+        Raises:
+            ApiError: Si le fichier est illisible ou l'upload échoue.
+        """
+        mime_type = mime_type or _guess_mime_type(file_name)
+        if isinstance(file_path, (bytes, bytearray, memoryview)):
+            return self.upload_bytes(file_path, file_name, mime_type, folder_id)
+        if not isinstance(file_path, (str, os.PathLike)):
+            media = _stream_media(file_path, mime_type)
+        elif os.path.getsize(file_path) < RESUMABLE_THRESHOLD:
+            # Lu en entier (et non jusqu'au seuil) : un fichier qui grossit entre-temps n'est pas tronqué
+            with open(file_path, "rb") as file:
+                media = _stream_media(io.BytesIO(file.read()), mime_type)
+        else:
+            # Gros fichier : lu depuis le disque au fil des morceaux
+            media = MediaFileUpload(file_path, mimetype=mime_type, chunksize=UPLOAD_CHUNK_SIZE, resumable=True)
+        return self._create_file(media, file_name, folder_id)
+
+    @api_method("la création du dossier")
     def create_folder(self, folder_name, parent_folder_id=None):
         """
         Crée un nouveau dossier sur Google Drive.
@@ -52,37 +127,48 @@ class GoogleDriveManager:
             folder_name (str): Nom du dossier à créer.
             parent_folder_id (str, optional): ID du dossier parent. Si None, le dossier est créé à la racine.
         Returns:
-            dict: Les métadonnées du dossier créé.
+            dict: Les métadonnées du dossier créé ({"folder_id"}).
+        Raises:
+            ApiError: Si la création échoue.
+        """
+        file_metadata = {
+            "name": folder_name,
+            "mimeType": "application/vnd.google-apps.folder",
+        }
+        if parent_folder_id:
+            file_metadata["parents"] = [parent_folder_id]
+
+        folder = execute(self.service.files().create(body=file_metadata, fields="id"))
+        return {"folder_id": folder.get("id")}
+
+    @api_method("la recherche de fichiers")
+    def iter_files(self, query):
+        """
+        Recherche des fichiers sur Google Drive, page par page.
+        Args:
+            query (str): La requête de recherche (ex: "name = 'mon_fichier.pdf'").
+        Yields:
+            dict: Les fichiers trouvés (id, name, mimeType, webViewLink).
+        Raises:
+            ApiError: Si une page ne peut être lue.
         """
-        try:
-            file_metadata = {
-                "name": folder_name,
-                "mimeType": "application/vnd.google-apps.folder",
-            }
-            if parent_folder_id:
-                file_metadata["parents"] = [parent_folder_id]
-
-            folder = self.service.files().create(body=file_metadata, fields="id").execute()
-            return {"status": "success", "folder_id": folder.get("id")}
-        except Exception as e:
-            return {"status": "error", "message": f"Erreur lors de la création du dossier: {e}"}
+        files = self.service.files()
+        request = files.list(
+            q=query, pageSize=SEARCH_PAGE_SIZE, fields="nextPageToken, files(id, name, mimeType, webViewLink)"
+        )
+        yield from iter_pages(files, request, "files")
 
     def search_files(self, query):
         """
-        Recherche des fichiers sur Google Drive.
+        Recherche des fichiers sur Google Drive (toutes les pages de résultats).
         Args:
             query (str): La requête de recherche (ex: "name = 'mon_fichier.pdf'").
         Returns:
             list: Une liste de dictionnaires représentant les fichiers trouvés.
+        Raises:
+            ApiError: Si une page ne peut être lue.
         """
-        try:
-            results = self.service.files().list(
-                q=query, fields="nextPageToken, files(id, name, mimeType, webViewLink)"
-            ).execute()
-            items = results.get("files", [])
-            return {"status": "success", "files": items}
-        except Exception as e:
-            return {"status": "error", "message": f"Erreur lors de la recherche de fichiers: {e}"}
+        return list(self.iter_files(query))
 
 if __name__ == "__main__":
     # Exemple d'utilisation (pour les tests locaux)
@@ -93,9 +179,9 @@ if __name__ == "__main__":
 
     # 1. Créer un dossier de test
     print("\n--- Création d'un dossier de test ---")
-    folder_result = drive_manager.create_folder("MFR_Test_Folder")
+    folder_result = safe_call(drive_manager.create_folder, "MFR_Test_Folder")
     print(folder_result)
-    test_folder_id = folder_result.get("folder_id")
+    test_folder_id = folder_result.get("result", {}).get("folder_id")
 
     if test_folder_id:
         # 2. Créer un fichier local pour l'upload
@@ -105,14 +191,14 @@ if __name__ == "__main__":
 
         # 3. Uploader un fichier
         print("\n--- Upload d'un fichier ---")
-        upload_result = drive_manager.upload_file(
-            test_file_path, "MonFichierTest.txt", "text/plain", folder_id=test_folder_id
+        upload_result = safe_call(
+            drive_manager.upload_file, test_file_path, "MonFichierTest.txt", "text/plain", folder_id=test_folder_id
         )
         print(upload_result)
 
         # 4. Rechercher le fichier uploadé
         print("\n--- Recherche du fichier ---")
-        search_result = drive_manager.search_files(f"name = 'MonFichierTest.txt' and '{test_folder_id}' in parents")
+        search_result = safe_call(drive_manager.search_files, f"name = 'MonFichierTest.txt' and '{test_folder_id}' in parents")
         print(search_result)
 
         # Nettoyage (supprimer le fichier local)
@@ -1,63 +1,98 @@
 import os
-import json
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from tools.auth import get_service  # noqa: E402
+from tools.google_api import api_method, execute, safe_call  # noqa: E402
+
+SHEETS_SCOPES = (
+    "https://www.googleapis.com/auth/spreadsheets",
+)
+
 
 class GoogleSheetsManager:
-    def __init__(self):
-        self.creds = self._get_credentials()
-        self.service = build('sheets', 'v4', credentials=self.creds)
+    # Services obtenus au premier appel d'API : instancier le manager
+    # (ex: à l'enregistrement des outils d'un agent) ne coûte rien
+    @property
+    def service(self):
+        return get_service("sheets", "v4", SHEETS_SCOPES)
+
+    @api_method("la lecture de la feuille")
+    def read_ranges(self, spreadsheet_id, ranges, value_render_option='FORMATTED_VALUE'):
+        """
+        Lit plusieurs plages d'une feuille Google Sheets en un seul appel (values.batchGet).
+        Args:
+            spreadsheet_id (str): L'ID de la feuille de calcul.
+            ranges (list): Les plages de cellules à lire (ex: ['Feuille1!A1:B10', 'Notes!A:C']).
+            value_render_option (str): 'FORMATTED_VALUE' (textes tels qu'affichés), 'UNFORMATTED_VALUE'
+                (nombres et dates bruts) ou 'FORMULA'.
+        Returns:
+            dict: {plage demandée: liste de listes des données lues}.
+        Raises:
+            ApiError: Si la lecture échoue.
+        """
+        result = execute(self.service.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id, ranges=list(ranges),
+            valueRenderOption=value_render_option, fields='valueRanges(range,values)'))
+        # Les plages sont renvoyées dans l'ordre de la requête, mais sous forme normalisée (ex: 'Feuille1'!A1:B10) ;
+        # "range" est gardé dans le masque pour qu'une plage vide ne disparaisse pas de la réponse
+        return {
+            range_name: value_range.get('values', [])
+            for range_name, value_range in zip(ranges, result.get('valueRanges', []))
+        }
 
-    def _get_credentials(self):
-        # Récupère les credentials depuis le secret GitHub GOOGLE_CREDENTIALS
-        creds_json = os.getenv("GOOGLE_CREDENTIALS")
-        if not creds_json:
-            raise ValueError("GOOGLE_CREDENTIALS environment variable not set.")
-        
-        creds_info = json.loads(creds_json)
-        creds = service_account.Credentials.from_service_account_info(
-            creds_info,
-            scopes=['https://www.googleapis.com/auth/spreadsheets']
-         )
-        return creds
+    @api_method("l'écriture dans la feuille")
+    def write_ranges(self, spreadsheet_id, updates, value_input_option='RAW'):
+        """
+        Écrit dans plusieurs plages d'une feuille Google Sheets en un seul appel (values.batchUpdate).
+        Args:
+            spreadsheet_id (str): L'ID de la feuille de calcul.
+            updates (list): Des tuples (plage, liste de listes des données à écrire).
+            value_input_option (str): 'RAW' (valeurs écrites telles quelles) ou 'USER_ENTERED'
+                (interprétées comme une saisie : formules, dates, nombres).
+        Returns:
+            dict: Le nombre de cellules modifiées ({"totalUpdatedCells", "responses": [{"updatedCells"}, ...]}).
+        Raises:
+            ApiError: Si l'écriture échoue.
+        """
+        body = {
+            'valueInputOption': value_input_option,
+            'data': [{'range': range_name, 'values': values} for range_name, values in updates]
+        }
+        # POST, mais rejouable : réécrire les mêmes valeurs dans les mêmes plages ne change rien
+        request = self.service.spreadsheets().values().batchUpdate(
+            spreadsheetId=spreadsheet_id, body=body, fields='totalUpdatedCells,responses(updatedCells)')
+        return execute(request, idempotent=True)
 
-    def read_sheet_data(self, spreadsheet_id, range_name):
+    def read_sheet_data(self, spreadsheet_id, range_name, value_render_option='FORMATTED_VALUE'):
         """
         Lit les données d'une feuille Google Sheets.
         Args:
             spreadsheet_id (str): L'ID de la feuille de calcul.
             range_name (str): La plage de cellules à lire (ex: 'Feuille1!A1:B10').
+            value_render_option (str): Voir read_ranges.
         Returns:
             list: Une liste de listes représentant les données lues.
+        Raises:
+            ApiError: Si la lecture échoue.
         """
-        try:
-            result = self.service.spreadsheets().values().get(
-                spreadsheetId=spreadsheet_id, range=range_name).execute()
-            rows = result.get('values', [])
-            return rows
-        except Exception as e:
-            return f"Erreur lors de la lecture de la feuille: {e}"
+        return self.read_ranges(spreadsheet_id, [range_name], value_render_option).get(range_name, [])
 
-    def write_sheet_data(self, spreadsheet_id, range_name, values):
+    def write_sheet_data(self, spreadsheet_id, range_name, values, value_input_option='RAW'):
         """
         Écrit des données dans une feuille Google Sheets.
         Args:
             spreadsheet_id (str): L'ID de la feuille de calcul.
             range_name (str): La plage de cellules où écrire (ex: 'Feuille1!A1').
             values (list): Une liste de listes représentant les données à écrire.
+            value_input_option (str): Voir write_ranges.
         Returns:
-            dict: Le résultat de l'opération d'écriture.
+            dict: Le résultat de l'opération d'écriture ({"updatedCells": ...}).
+        Raises:
+            ApiError: Si l'écriture échoue.
         """
-        try:
-            body = {
-                'values': values
-            }
-            result = self.service.spreadsheets().values().update(
-                spreadsheetId=spreadsheet_id, range=range_name,
-                valueInputOption='RAW', body=body).execute()
-            return result
-        except Exception as e:
-            return f"Erreur lors de l'écriture dans la feuille: {e}"
+        result = self.write_ranges(spreadsheet_id, [(range_name, values)], value_input_option)
+        return (result.get('responses') or [result])[0]
 
 if __name__ == "__main__":
     # Exemple d'utilisation (pour les tests locaux)
@@ -74,16 +109,16 @@ if __name__ == "__main__":
 
         # Test de lecture
         print("\n--- Lecture de données ---")
-        read_result = sheets_manager.read_sheet_data(TEST_SPREADSHEET_ID, 'Feuille1!A1:B2')
+        read_result = safe_call(sheets_manager.read_sheet_data, TEST_SPREADSHEET_ID, 'Feuille1!A1:B2')
         print(read_result)
 
         # Test d'écriture
         print("\n--- Écriture de données ---")
         write_values = [['Nom', 'Valeur'], ['Test', '123']]
-        write_result = sheets_manager.write_sheet_data(TEST_SPREADSHEET_ID, 'Feuille1!A1', write_values)
+        write_result = safe_call(sheets_manager.write_sheet_data, TEST_SPREADSHEET_ID, 'Feuille1!A1', write_values)
         print(write_result)
 
         # Relire pour vérifier l'écriture
         print("\n--- Re-lecture après écriture ---")
-        read_after_write_result = sheets_manager.read_sheet_data(TEST_SPREADSHEET_ID, 'Feuille1!A1:B2')
+        read_after_write_result = safe_call(sheets_manager.read_sheet_data, TEST_SPREADSHEET_ID, 'Feuille1!A1:B2')
         print(read_after_write_result)
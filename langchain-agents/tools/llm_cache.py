@@ -0,0 +1,117 @@
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "mfr", "llm_cache.sqlite3")
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+
+class LLMCache:
+    """
+    Cache persistant (SQLite) des réponses LLM, indexé par le SHA256 de la requête.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL_SECONDS):
+        self.ttl = ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, model TEXT, prompt TEXT, response TEXT, ts REAL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def key(request):
+        """
+        Calcule la clé déterministe d'une requête chat.completions.
+        Args:
+            request (dict): Les paramètres de la requête (model, messages, temperature, ...).
+        Returns:
+            str: L'empreinte SHA256 hexadécimale.
+        """
+        canonical = json.dumps(request, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Renvoie la réponse en cache pour une clé, ou None si absente ou expirée.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT response, ts FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return row[0]
+
+    def set(self, key, request, response):
+        """
+        Enregistre la réponse d'une requête.
+        """
+        prompt = json.dumps(request.get("messages", []), ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, prompt, response, ts) VALUES (?, ?, ?, ?, ?)",
+                (key, request.get("model"), prompt, response, time.time()),
+            )
+            self._conn.commit()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Renvoie le cache partagé du processus, ou None si LLM_CACHE_DISABLE=1.
+    Le chemin peut être surchargé via la variable d'environnement LLM_CACHE_PATH.
+    """
+    global _cache
+    if os.getenv("LLM_CACHE_DISABLE") == "1":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache(os.path.expanduser(os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH)))
+    return _cache
+
+
+def cached_llm_call(fn):
+    """
+    Décorateur de mise en cache pour une fonction fn(client, request, *args) -> str (sync ou async).
+    La clé ne dépend que de request : les arguments supplémentaires doivent en être déduits.
+    """
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(client, request, *args):
+            cache = get_cache()
+            if cache is None:
+                return await fn(client, request, *args)
+            key = cache.key(request)
+            hit = cache.get(key)
+            if hit is not None:
+                return hit
+            response = await fn(client, request, *args)
+            cache.set(key, request, response)
+            return response
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(client, request, *args):
+        cache = get_cache()
+        if cache is None:
+            return fn(client, request, *args)
+        key = cache.key(request)
+        hit = cache.get(key)
+        if hit is not None:
+            return hit
+        response = fn(client, request, *args)
+        cache.set(key, request, response)
+        return response
+    return wrapper
@@ -0,0 +1,82 @@
+from tools.ratelimit import count_tokens, estimate_tokens
+
+# Modèle OpenAI par niveau de criticité. gpt-4o est réservé aux vérifications de conformité
+# et aux plans de remédiation, où une hallucination coûte le plus cher ; le reste passe par gpt-4o-mini.
+MODEL_TIERS = {
+    "compliance": "gpt-4o",
+    "content": "gpt-4o-mini",
+    "test": "gpt-4o-mini",
+}
+
+# Plafond de tokens générés par niveau, pour les réponses unitaires
+MAX_TOKENS = {
+    "compliance": 1200,
+    "content": 2000,
+    "test": 20,
+}
+# Limite de sortie des modèles gpt-4o / gpt-4o-mini, pour les réponses groupées
+MAX_OUTPUT_TOKENS = 16384
+
+# Fenêtre de contexte (prompt + sortie) des modèles utilisés par les agents
+CONTEXT_WINDOWS = {
+    "gpt-4o": 128_000,
+    "gpt-4o-mini": 128_000,
+    "deepseek-coder": 64_000,
+}
+
+
+def select_model(models, tier, complexity=None):
+    """
+    Choisit le modèle à utiliser pour un appel.
+    Args:
+        models (dict): La correspondance niveau -> modèle (voir MODEL_TIERS).
+        tier (str): Le niveau par défaut de la méthode appelante ("compliance", "content", "test").
+        complexity (str, optional): "high" escalade vers le modèle "compliance", "low" redescend vers "content".
+    Returns:
+        str: Le nom du modèle.
+    """
+    if complexity == "high":
+        return models["compliance"]
+    if complexity == "low":
+        return models["content"]
+    return models[tier]
+
+
+def pick_model(prompt, models, tier, complexity=None):
+    """
+    Comme select_model, mais bascule vers un modèle à plus grande fenêtre si le prompt
+    (plus la sortie maximale du niveau) ne tient pas dans celle du modèle choisi.
+    Args:
+        prompt (str): Le prompt utilisateur.
+        models (dict): La correspondance niveau -> modèle (voir MODEL_TIERS).
+        tier (str): Le niveau par défaut de la méthode appelante.
+        complexity (str, optional): Voir select_model.
+    Returns:
+        str: Le nom du modèle. Si aucun ne suffit, celui à la plus grande fenêtre (check_context refusera l'appel).
+    """
+    model = select_model(models, tier, complexity)
+    needed = count_tokens(prompt, model) + MAX_TOKENS.get(tier, 0)
+    if needed <= CONTEXT_WINDOWS.get(model, float("inf")):
+        return model
+    candidates = sorted(set(models.values()), key=lambda name: CONTEXT_WINDOWS.get(name, 0))
+    for candidate in candidates:
+        if needed <= CONTEXT_WINDOWS.get(candidate, 0):
+            return candidate
+    return candidates[-1]
+
+
+def check_context(request):
+    """
+    Refuse localement une requête qui dépasse la fenêtre de contexte de son modèle,
+    au lieu d'attendre l'erreur 400 de l'API après l'aller-retour réseau.
+    Args:
+        request (dict): Les paramètres de chat.completions.create.
+    Raises:
+        ValueError: Si le prompt et la sortie maximale dépassent la fenêtre du modèle.
+    """
+    limit = CONTEXT_WINDOWS.get(request.get("model"))
+    if limit is None:
+        return
+    needed = estimate_tokens(request)
+    if needed > limit:
+        raise ValueError(f"Prompt trop long pour {request['model']} : {needed} tokens (limite {limit})")
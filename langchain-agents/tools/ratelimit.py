@@ -0,0 +1,168 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+
+import tiktoken
+
+# Limites par défaut (par modèle), à aligner sur le palier du compte via l'environnement
+DEFAULT_REQUESTS_PER_MINUTE = 500
+DEFAULT_TOKENS_PER_MINUTE = 200_000
+# Pause appliquée à tous les appels après un 429 sans en-tête Retry-After
+DEFAULT_RATE_LIMIT_PAUSE_SECONDS = 15
+# Surcoût en tokens de chaque message (rôle, délimiteurs), comme api_request_parallel_processor
+TOKENS_PER_MESSAGE = 4
+# Approximation utilisée si l'encodage tiktoken n'est pas disponible (fichier BPE non téléchargeable)
+CHARS_PER_TOKEN = 4
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model):
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            # Modèle inconnu de tiktoken (ex: deepseek-coder) : estimation avec l'encodage le plus récent
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # Le limiteur ne doit jamais bloquer un appel : on retombe sur l'approximation en caractères
+        return None
+
+
+def count_tokens(text, model="gpt-4o"):
+    """
+    Compte les tokens d'un texte pour un modèle (approximation si l'encodage est indisponible).
+    Args:
+        text (str): Le texte à mesurer.
+        model (str): Le modèle dont l'encodage s'applique.
+    Returns:
+        int: Le nombre de tokens.
+    """
+    encoding = _encoding(model)
+    return len(encoding.encode(text)) if encoding else len(text) // CHARS_PER_TOKEN + 1
+
+
+def estimate_tokens(request):
+    """
+    Estime la consommation en tokens d'une requête chat.completions (prompt + sortie maximale).
+    Args:
+        request (dict): Les paramètres de chat.completions.create.
+    Returns:
+        int: Le nombre de tokens décompté du quota par minute.
+    """
+    model = request.get("model", "")
+    prompt_tokens = sum(
+        TOKENS_PER_MESSAGE + count_tokens(message.get("content") or "", model)
+        for message in request.get("messages", [])
+    )
+    return prompt_tokens + request.get("max_tokens", 0)
+
+
+def retry_after_seconds(error):
+    """
+    Lit le délai imposé par l'API dans une erreur 429 (en-têtes retry-after-ms ou retry-after).
+    Args:
+        error (Exception): L'erreur levée par le client (RateLimitError).
+    Returns:
+        float: Le délai en secondes, ou None si l'API n'en indique pas.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        return None
+    return None
+
+
+class TokenBucket:
+    """
+    Double seau à jetons (requêtes et tokens par minute) partagé par tous les appels d'un modèle.
+    Les capacités se rechargent en continu ; un appel attend que les deux seaux suffisent.
+    """
+
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._available_requests = requests_per_minute
+        self._available_tokens = tokens_per_minute
+        self._last_update = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _try_acquire(self, tokens):
+        # Renvoie 0 si la capacité a été réservée, sinon le délai d'attente estimé
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            elapsed = now - self._last_update
+            self._last_update = now
+            self._available_requests = min(
+                self.requests_per_minute, self._available_requests + self.requests_per_minute * elapsed / 60
+            )
+            self._available_tokens = min(
+                self.tokens_per_minute, self._available_tokens + self.tokens_per_minute * elapsed / 60
+            )
+            # Une requête plus grosse que le quota entier passe dès que le seau est plein
+            tokens = min(tokens, self.tokens_per_minute)
+            if self._available_requests >= 1 and self._available_tokens >= tokens:
+                self._available_requests -= 1
+                self._available_tokens -= tokens
+                return 0
+            missing_requests = max(0, 1 - self._available_requests) * 60 / self.requests_per_minute
+            missing_tokens = max(0, tokens - self._available_tokens) * 60 / self.tokens_per_minute
+            return max(missing_requests, missing_tokens)
+
+    def acquire(self, tokens):
+        """
+        Bloque jusqu'à ce que la requête et ses tokens estimés puissent partir.
+        """
+        while True:
+            wait = self._try_acquire(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def aacquire(self, tokens):
+        """
+        Variante asynchrone de acquire (n'occupe pas la boucle d'événements pendant l'attente).
+        """
+        while True:
+            wait = self._try_acquire(tokens)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds=DEFAULT_RATE_LIMIT_PAUSE_SECONDS):
+        """
+        Suspend tous les appels du seau après un 429, pour laisser le quota se reconstituer.
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(model):
+    """
+    Renvoie le seau partagé d'un modèle. Les limites se règlent via LLM_REQUESTS_PER_MINUTE
+    et LLM_TOKENS_PER_MINUTE (communes à tous les modèles).
+    Args:
+        model (str): Le nom du modèle.
+    Returns:
+        TokenBucket: Le seau du modèle.
+    """
+    with _buckets_lock:
+        if model not in _buckets:
+            _buckets[model] = TokenBucket(
+                int(os.getenv("LLM_REQUESTS_PER_MINUTE", DEFAULT_REQUESTS_PER_MINUTE)),
+                int(os.getenv("LLM_TOKENS_PER_MINUTE", DEFAULT_TOKENS_PER_MINUTE)),
+            )
+        return _buckets[model]
@@ -0,0 +1,186 @@
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from tools.clients import get_async_openai, get_openai
+from tools.completions import acomplete, complete
+
+try:
+    import faiss
+except ImportError:  # faiss-cpu absent : le cache sémantique est simplement désactivé
+    faiss = None
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "mfr", "semantic_cache.sqlite3")
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 256
+SIMILARITY_THRESHOLD = 0.92
+# Remplace le nom de l'élève dans les prompts normalisés et les réponses stockées
+NAME_PLACEHOLDER = "[ÉLÈVE]"
+
+
+class SemanticCache:
+    """
+    Cache sémantique des réponses LLM : un prompt dont l'embedding est assez proche
+    (cosinus >= threshold) d'un prompt déjà traité dans le même scope réutilise sa réponse.
+    Les embeddings et réponses sont persistés dans SQLite, l'index FAISS est reconstruit à la demande.
+    """
+
+    def __init__(self, client, aclient, path=DEFAULT_CACHE_PATH, threshold=SIMILARITY_THRESHOLD):
+        self.client = client
+        self.aclient = aclient
+        self.threshold = threshold
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS semantic_cache ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, scope TEXT, prompt TEXT, response TEXT, embedding BLOB, ts REAL)"
+        )
+        self._conn.commit()
+        self._indexes = {}
+
+    def embed(self, text):
+        """
+        Calcule l'embedding normalisé (L2) d'un prompt.
+        """
+        result = self.client.embeddings.create(model=EMBEDDING_MODEL, input=text, dimensions=EMBEDDING_DIMENSIONS)
+        return self._normalize(result.data[0].embedding)
+
+    async def aembed(self, text):
+        """
+        Variante asynchrone de embed.
+        """
+        result = await self.aclient.embeddings.create(model=EMBEDDING_MODEL, input=text, dimensions=EMBEDDING_DIMENSIONS)
+        return self._normalize(result.data[0].embedding)
+
+    @staticmethod
+    def _normalize(embedding):
+        vector = np.asarray([embedding], dtype="float32")
+        faiss.normalize_L2(vector)
+        return vector
+
+    def _index_for(self, scope):
+        if scope not in self._indexes:
+            index = faiss.IndexFlatIP(EMBEDDING_DIMENSIONS)
+            row_ids = []
+            rows = self._conn.execute("SELECT id, embedding FROM semantic_cache WHERE scope = ?", (scope,)).fetchall()
+            if rows:
+                index.add(np.vstack([np.frombuffer(blob, dtype="float32") for _, blob in rows]))
+                row_ids = [row_id for row_id, _ in rows]
+            self._indexes[scope] = (index, row_ids)
+        return self._indexes[scope]
+
+    def search(self, scope, vector):
+        """
+        Renvoie la réponse du prompt le plus proche dans le scope, ou None sous le seuil.
+        """
+        with self._lock:
+            index, row_ids = self._index_for(scope)
+            if index.ntotal == 0:
+                return None
+            scores, positions = index.search(vector, 1)
+            if scores[0][0] < self.threshold:
+                return None
+            row = self._conn.execute("SELECT response FROM semantic_cache WHERE id = ?", (row_ids[positions[0][0]],)).fetchone()
+        return row[0] if row else None
+
+    def add(self, scope, prompt, vector, response):
+        """
+        Enregistre un prompt normalisé, son embedding et sa réponse.
+        """
+        with self._lock:
+            index, row_ids = self._index_for(scope)
+            cursor = self._conn.execute(
+                "INSERT INTO semantic_cache (scope, prompt, response, embedding, ts) VALUES (?, ?, ?, ?, ?)",
+                (scope, prompt, response, vector.tobytes(), time.time()),
+            )
+            self._conn.commit()
+            index.add(vector)
+            row_ids.append(cursor.lastrowid)
+
+
+_semantic_cache = None
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache():
+    """
+    Renvoie le cache sémantique partagé du processus, ou None si faiss est absent
+    ou si SEMANTIC_CACHE_DISABLE=1. Le chemin peut être surchargé via SEMANTIC_CACHE_PATH.
+    """
+    global _semantic_cache
+    if faiss is None or os.getenv("SEMANTIC_CACHE_DISABLE") == "1":
+        return None
+    with _semantic_cache_lock:
+        if _semantic_cache is None:
+            _semantic_cache = SemanticCache(
+                get_openai(),
+                get_async_openai(),
+                os.path.expanduser(os.getenv("SEMANTIC_CACHE_PATH", DEFAULT_CACHE_PATH)),
+            )
+    return _semantic_cache
+
+
+def _personalize(result, result_key, name):
+    if name and result.get("status") == "success":
+        result[result_key] = result[result_key].replace(NAME_PLACEHOLDER, name)
+    return result
+
+
+def _anonymize(response, name):
+    return response.replace(name, NAME_PLACEHOLDER) if name else response
+
+
+def semantic_complete(client, request, result_key, error_label, scope, normalized_prompt, name=None):
+    """
+    complete() précédé d'une recherche dans le cache sémantique.
+    Args:
+        client (OpenAI): Le client synchrone.
+        request (dict): Les paramètres de chat.completions.create.
+        result_key (str): La clé sous laquelle renvoyer le contenu généré.
+        error_label (str): Le libellé de l'opération, repris dans le message d'erreur.
+        scope (str): L'espace de recherche (ex: "compliance:D1.3:gpt-4o"), jamais partagé entre compétences.
+        normalized_prompt (str): Le prompt à comparer, sans le nom de l'élève.
+        name (str, optional): Le nom de l'élève, réinjecté à la place de NAME_PLACEHOLDER.
+    Returns:
+        dict: Le même format que complete().
+    """
+    cache = get_semantic_cache()
+    if cache is None:
+        return complete(client, request, result_key, error_label)
+    try:
+        vector = cache.embed(normalized_prompt)
+        hit = cache.search(scope, vector)
+    except Exception:
+        return complete(client, request, result_key, error_label)
+    if hit is not None:
+        return _personalize({"status": "success", result_key: hit}, result_key, name)
+    result = complete(client, request, result_key, error_label)
+    if result["status"] == "success":
+        cache.add(scope, normalized_prompt, vector, _anonymize(result[result_key], name))
+    return result
+
+
+async def asemantic_complete(aclient, request, result_key, error_label, scope, normalized_prompt, name=None):
+    """
+    Variante asynchrone de semantic_complete.
+    """
+    cache = get_semantic_cache()
+    if cache is None:
+        return await acomplete(aclient, request, result_key, error_label)
+    try:
+        vector = await cache.aembed(normalized_prompt)
+        hit = cache.search(scope, vector)
+    except Exception:
+        return await acomplete(aclient, request, result_key, error_label)
+    if hit is not None:
+        return _personalize({"status": "success", result_key: hit}, result_key, name)
+    result = await acomplete(aclient, request, result_key, error_label)
+    if result["status"] == "success":
+        cache.add(scope, normalized_prompt, vector, _anonymize(result[result_key], name))
+    return result
@@ -0,0 +1,72 @@
+import functools
+import os
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # PyYAML compilé sans libyaml
+    from yaml import SafeLoader
+
+try:
+    import msgpack
+except ImportError:  # msgpack absent : pas de fichier compagnon, le YAML est parsé à chaque démarrage
+    msgpack = None
+
+SIDECAR_SUFFIX = ".msgpack"
+
+
+def _parse_yaml(path):
+    with open(path, "r", encoding="utf-8") as file:
+        return yaml.load(file, Loader=SafeLoader)
+
+
+def _read_sidecar(sidecar, mtime):
+    # Le fichier compagnon n'est valide que s'il est au moins aussi récent que le YAML source
+    try:
+        if os.path.getmtime(sidecar) < mtime:
+            return None
+        with open(sidecar, "rb") as file:
+            return msgpack.unpackb(file.read(), raw=False)
+    except (OSError, ValueError, msgpack.UnpackException):
+        return None
+
+
+def _write_sidecar(sidecar, data):
+    # Écriture atomique ; un répertoire en lecture seule ou une valeur non sérialisable
+    # (ex: date YAML) désactive simplement le fichier compagnon
+    tmp_path = f"{sidecar}.{os.getpid()}.tmp"
+    try:
+        packed = msgpack.packb(data, use_bin_type=True)
+        with open(tmp_path, "wb") as file:
+            file.write(packed)
+        os.replace(tmp_path, sidecar)
+    except (OSError, TypeError, ValueError):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+@functools.lru_cache(maxsize=16)
+def _load(path, mtime):
+    # mtime fait partie de la clé : une modification du fichier invalide l'entrée
+    if msgpack is None:
+        return _parse_yaml(path)
+    sidecar = path + SIDECAR_SUFFIX
+    data = _read_sidecar(sidecar, mtime)
+    if data is None:
+        data = _parse_yaml(path)
+        _write_sidecar(sidecar, data)
+    return data
+
+
+def load_yaml(path):
+    """
+    Charge un fichier YAML de configuration, mémoïsé dans le processus et sérialisé
+    dans un fichier compagnon <path>.msgpack (rechargé bien plus vite que le YAML au démarrage suivant).
+    L'objet renvoyé est partagé entre les appelants : il ne doit pas être modifié.
+    Args:
+        path (str): Le chemin du fichier YAML.
+    Returns:
+        object: Le contenu décodé.
+    """
+    return _load(path, os.path.getmtime(path))
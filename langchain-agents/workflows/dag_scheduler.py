@@ -0,0 +1,190 @@
+import asyncio
+import inspect
+import os
+import sys
+from collections.abc import Hashable
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agents"))
+
+# Préfixe d'une entrée faisant référence au résultat d'un nœud amont (ex: "$profils")
+REFERENCE_PREFIX = "$"
+
+
+def agent_handlers(*agents):
+    """
+    Construit la table action -> méthode asynchrone à partir d'instances d'agents.
+    Chaque méthode publique "xxx" disposant d'une variante asynchrone "axxx" est exposée sous le nom "xxx".
+    Args:
+        *agents: Les instances d'agents (AcademicComplianceAgent, OpenAIContentGenerator, ...).
+    Returns:
+        dict: {nom de l'action: coroutine function}.
+    """
+    handlers = {}
+    for agent in agents:
+        for name, method in inspect.getmembers(agent, inspect.iscoroutinefunction):
+            if name.startswith("a") and not name.startswith("_") and hasattr(agent, name[1:]):
+                handlers[name[1:]] = method
+    return handlers
+
+
+def topological_order(nodes):
+    """
+    Trie les nœuds d'un DAG de sorte que chaque nœud suive ses dépendances.
+    Args:
+        nodes (list): Les nœuds {"id", "action", "inputs", "depends_on"}.
+    Returns:
+        list: Les identifiants des nœuds, dans un ordre d'exécution valide.
+    Raises:
+        ValueError: Si un identifiant est dupliqué, une dépendance inconnue ou le graphe cyclique.
+    """
+    ids = [node["id"] for node in nodes]
+    if len(set(ids)) != len(ids):
+        raise ValueError("Identifiants de nœuds dupliqués dans le workflow.")
+    remaining = {node["id"]: set(node.get("depends_on", [])) for node in nodes}
+    for node_id, dependencies in remaining.items():
+        unknown = dependencies - remaining.keys()
+        if unknown:
+            raise ValueError(f"Le nœud {node_id} dépend de nœuds inconnus : {sorted(unknown)}")
+    order = []
+    ready = [node_id for node_id in ids if not remaining[node_id]]
+    while ready:
+        node_id = ready.pop(0)
+        order.append(node_id)
+        for other_id in ids:
+            if node_id in remaining[other_id]:
+                remaining[other_id].discard(node_id)
+                if not remaining[other_id] and other_id not in order and other_id not in ready:
+                    ready.append(other_id)
+    if len(order) != len(ids):
+        raise ValueError("Le workflow contient un cycle.")
+    return order
+
+
+def _node_error(node):
+    # Motif de rejet d'un nœud mal formé, ou None s'il est exploitable
+    if not isinstance(node, dict) or "id" not in node or "action" not in node:
+        return "id ou action manquant"
+    if not isinstance(node["id"], Hashable) or not isinstance(node["action"], Hashable):
+        return "id ou action invalide"
+    if not isinstance(node.get("inputs", {}), dict):
+        return "inputs doit être un objet"
+    depends_on = node.get("depends_on", [])
+    if not isinstance(depends_on, list) or not all(isinstance(dependency, Hashable) for dependency in depends_on):
+        return "depends_on doit être une liste d'identifiants"
+    return None
+
+
+def _references(node):
+    # Nœuds amont cités dans les entrées ("$<id>"), dans l'ordre d'apparition
+    return [
+        value[len(REFERENCE_PREFIX):] for value in node.get("inputs", {}).values()
+        if isinstance(value, str) and value.startswith(REFERENCE_PREFIX)
+    ]
+
+
+def _with_references(nodes):
+    # Ajoute aux dépendances de chaque nœud les nœuds référencés dans ses entrées : le modèle omet souvent
+    # depends_on, et l'entrée "$<id>" serait alors résolue ou non selon l'ordre d'exécution.
+    # Lève ValueError si une entrée référence un nœud inconnu.
+    ids = {node["id"] for node in nodes}
+    prepared = []
+    for node in nodes:
+        references = _references(node)
+        unknown = sorted(set(references) - ids, key=str)
+        if unknown:
+            raise ValueError(f"Le nœud {node['id']} référence des nœuds inconnus : {unknown}")
+        depends_on = list(dict.fromkeys(node.get("depends_on", []) + references))
+        prepared.append({**node, "depends_on": depends_on})
+    return prepared
+
+
+def _failed(result):
+    return isinstance(result, dict) and result.get("status") == "error"
+
+
+def _resolve(value, results):
+    if not (isinstance(value, str) and value.startswith(REFERENCE_PREFIX) and value[1:] in results):
+        return value
+    # Un résultat {"status": "success", <clé>: contenu} est transmis par son seul contenu
+    result = results[value[1:]]
+    outputs = [output for key, output in result.items() if key != "status"] if isinstance(result, dict) else []
+    return outputs[0] if len(outputs) == 1 else result
+
+
+async def run_dag(dag, handlers, max_concurrency=10):
+    """
+    Exécute un DAG de workflow : chaque nœud démarre dès que ses dépendances sont terminées,
+    les nœuds indépendants s'exécutent en parallèle.
+    Args:
+        dag (dict): {"nodes": [{"id", "action", "inputs", "depends_on"}, ...]} (voir GeminiComplianceAgent.orchestrate_workflow).
+        handlers (dict): {nom de l'action: coroutine function}, voir agent_handlers().
+        max_concurrency (int): Le nombre maximal de nœuds exécutés simultanément.
+    Returns:
+        dict: {"status": "success", "results": {id du nœud: résultat}} ou {"status": "error", "message": ...}.
+    """
+    dag_nodes = dag.get("nodes", [])
+    # Un DAG produit par un LLM peut omettre des champs : il est refusé ici plutôt qu'en cours d'exécution
+    if not isinstance(dag_nodes, list):
+        return {"status": "error", "message": "Workflow invalide : nodes doit être une liste"}
+    invalid = {position: error for position, node in enumerate(dag_nodes) if (error := _node_error(node))}
+    if invalid:
+        return {"status": "error", "message": f"Workflow invalide : nœuds mal formés (position: motif) {invalid}"}
+    try:
+        dag_nodes = _with_references(dag_nodes)
+        # Sur la liste complète, pour que les identifiants dupliqués soient détectés
+        order = topological_order(dag_nodes)
+    except (KeyError, TypeError, ValueError) as e:
+        return {"status": "error", "message": f"Workflow invalide : {e}"}
+    nodes = {node["id"]: node for node in dag_nodes}
+    unknown = sorted({nodes[node_id]["action"] for node_id in order} - handlers.keys(), key=str)
+    if unknown:
+        return {"status": "error", "message": f"Actions inconnues dans le workflow : {unknown}"}
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    results = {}
+    tasks = {}
+
+    async def _run(node):
+        dependencies = node.get("depends_on", [])
+        await asyncio.gather(*(tasks[dependency] for dependency in dependencies))
+        failed = [dependency for dependency in dependencies if _failed(results[dependency])]
+        if failed:
+            results[node["id"]] = {"status": "error", "message": f"Dépendances en échec : {failed}"}
+            return
+        inputs = {key: _resolve(value, results) for key, value in node.get("inputs", {}).items()}
+        async with semaphore:
+            try:
+                results[node["id"]] = await handlers[node["action"]](**inputs)
+            except Exception as e:
+                results[node["id"]] = {"status": "error", "message": f"Erreur lors du nœud {node['id']} : {e}"}
+
+    # L'ordre topologique garantit que les tâches des dépendances existent avant leurs dépendants
+    for node_id in order:
+        tasks[node_id] = asyncio.ensure_future(_run(nodes[node_id]))
+    await asyncio.gather(*tasks.values())
+    return {"status": "success", "results": results}
+
+
+if __name__ == "__main__":
+    # Exemple d'utilisation (pour les tests locaux)
+    # Assurez-vous que OPENAI_API_KEY et GEMINI_API_KEY sont définis dans votre environnement ou .env
+    from gemini_compliance_agent import GeminiComplianceAgent
+    from openai_content_generator import OpenAIContentGenerator
+
+    handlers = agent_handlers(OpenAIContentGenerator())
+    orchestrator = GeminiComplianceAgent()
+
+    async def main():
+        plan = await orchestrator.aorchestrate_workflow(
+            "Préparation hebdomadaire : un résumé de leçon et un quiz sur les fractions, indépendants l'un de l'autre.",
+            "Aucune étape exécutée.",
+            sorted(handlers),
+        )
+        print("\n--- DAG du workflow ---")
+        print(plan)
+        if plan["status"] == "success":
+            print("\n--- Résultats ---")
+            print(await run_dag(plan["dag"], handlers))
+
+    asyncio.run(main())